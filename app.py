@@ -6,16 +6,29 @@ Professional Production Version
 from flask import Flask, redirect, session, send_from_directory, jsonify
 from flask_cors import CORS
 import os
+import time
+import threading
+import click
 from datetime import timedelta
 
+from config.database import init_app as init_db, pool, read_pool, settings_cache, get_connection, scratch_database
+from config.migrations import migrate
+from config.writer import writer
+from config.rollups import rebuild_rollups
+from config.generations import generations
+from config.events import event_bus
+from config.catalog import catalog, benchmark_scans
+
 # Import route blueprints
 from routes.auth import auth_bp
 from routes.categories import categories_bp
 from routes.customers import customers_bp
 from routes.products import products_bp
-from routes.invoices import invoices_bp
-from routes.analytics import analytics_bp
+from routes.invoices import invoices_bp, benchmark_invoice_writes
+from routes.analytics import analytics_bp, analytics_cache
 from routes.settings import settings_bp
+from routes.batch import batch_bp
+from routes.stream import stream_bp
 
 # Initialize Flask app
 # We explicitly set static_folder to 'static'
@@ -31,6 +44,137 @@ app.config['SESSION_COOKIE_SECURE'] = True if os.environ.get('VERCEL') or os.env
 # Enable CORS
 CORS(app, supports_credentials=True)
 
+# Apply schema migrations once at startup, then bind pooled connections to requests
+migrate()
+init_db(app)
+
+def load_catalog():
+    """Load the product catalog outside a request; returns the snapshot"""
+    conn = get_connection()
+    if not conn:
+        return None
+    try:
+        return catalog.load(conn)
+    finally:
+        conn.close()
+
+# Load the catalog before the first scan needs it
+load_catalog()
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending database migrations"""
+    versions = migrate()
+    if versions:
+        print(f"Applied migrations: {', '.join(str(v) for v in versions)}")
+    else:
+        print("Database schema is up to date")
+
+@app.cli.command('rebuild-rollups')
+@click.argument('names', nargs=-1)
+def rebuild_rollups_command(names):
+    """Recompute sales rollups from invoices (all, or only NAMES)"""
+    conn = get_connection()
+    if not conn:
+        raise click.ClickException('Database connection failed')
+    try:
+        names = rebuild_rollups(conn, names)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    finally:
+        conn.close()
+    # Running workers drop analytics cached from the old rollups
+    generations.bump('invoices', 'customers', 'products')
+    print(f"Rebuilt rollups: {', '.join(names)}")
+
+@app.cli.command('bench-scan')
+@click.option('--count', default=1_000_000, help='Number of barcode lookups')
+def bench_scan_command(count):
+    """Measure in-memory barcode scans per second"""
+    snapshot = load_catalog()
+    rate = benchmark_scans(snapshot, count)
+    print(f"{len(snapshot.by_barcode)} barcodes, {catalog.stats()['last_load_ms']} ms to load")
+    print(f"{rate:,.0f} scans/s ({1e9 / rate:.0f} ns per scan)")
+
+@app.cli.command('bench-invoice')
+@click.option('--lines', multiple=True, type=int, default=(1, 10, 100, 1000),
+              help='Cart size to time (repeatable)')
+@click.option('--runs', default=50, help='Invoices written per cart size')
+def bench_invoice_command(lines, runs):
+    """Measure invoice writes per cart size on a scratch copy of the database"""
+    with scratch_database():
+        conn = get_connection()
+        try:
+            for count in lines:
+                ms = benchmark_invoice_writes(conn, count, runs)
+                print(f"lines={count}: {ms:.3f} ms per invoice")
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        finally:
+            conn.close()
+
+# Requests the readers of bench-mixed cycle through
+MIXED_READS = ('/api/analytics.php?action=dashboard', '/api/analytics.php?action=sales_chart',
+               '/api/analytics.php?action=top_products', '/api/invoices.php?action=list')
+
+def benchmark_mixed_load(writers, readers, seconds):
+    """Run invoice-writer and dashboard-reader threads against the test client
+    for `seconds`; returns {'writes'|'reads': (succeeded, failed)}"""
+    conn = get_connection()
+    try:
+        product_ids = [row[0] for row in conn.execute("SELECT id FROM products WHERE is_active = 1 LIMIT 20")]
+    finally:
+        conn.close()
+    if not product_ids:
+        raise ValueError('No active products to sell')
+
+    counts = {'writes': [0, 0], 'reads': [0, 0]}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(kind, index):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['logged_in'] = True
+            sess['user_id'] = 1
+        done = [0, 0]
+        n = 0
+        while time.monotonic() < deadline:
+            if kind == 'writes':
+                items = [{'product_id': product_ids[(index + n + i) % len(product_ids)], 'quantity': 1,
+                          'unit_price': 1.0} for i in range(3)]
+                response = client.post('/api/invoices.php?action=create', json={'items': items})
+            else:
+                response = client.get(MIXED_READS[(index + n) % len(MIXED_READS)])
+            ok = response.status_code == 304 or (response.status_code == 200 and response.get_json()['success'])
+            done[0 if ok else 1] += 1
+            n += 1
+        with lock:
+            counts[kind][0] += done[0]
+            counts[kind][1] += done[1]
+
+    threads = [threading.Thread(target=worker, args=('writes', i)) for i in range(writers)]
+    threads += [threading.Thread(target=worker, args=('reads', i)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {kind: tuple(pair) for kind, pair in counts.items()}
+
+@app.cli.command('bench-mixed')
+@click.option('--writers', default=4, help='Invoice-writer threads')
+@click.option('--readers', default=4, help='Dashboard-reader threads')
+@click.option('--seconds', default=5.0, help='How long to run')
+def bench_mixed_command(writers, readers, seconds):
+    """Measure writes and reads per second under a mixed load on a scratch copy of the database"""
+    with scratch_database():
+        try:
+            results = benchmark_mixed_load(writers, readers, seconds)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    for kind, (succeeded, failed) in results.items():
+        print(f"{kind}: {succeeded / seconds:,.0f}/s ({failed} failed)")
+
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/api')
 app.register_blueprint(categories_bp, url_prefix='/api')
@@ -39,6 +183,8 @@ app.register_blueprint(products_bp, url_prefix='/api')
 app.register_blueprint(invoices_bp, url_prefix='/api')
 app.register_blueprint(analytics_bp, url_prefix='/api')
 app.register_blueprint(settings_bp, url_prefix='/api')
+app.register_blueprint(batch_bp, url_prefix='/api')
+app.register_blueprint(stream_bp, url_prefix='/api')
 
 @app.route('/')
 def index():
@@ -55,7 +201,17 @@ def serve_pages(path):
 
 @app.route('/api/health')
 def health():
-    return jsonify({"status": "healthy", "service": "billmaster-pro"})
+    return jsonify({
+        "status": "healthy",
+        "service": "billmaster-pro",
+        "db_pool": {"write": pool.stats(), "read": read_pool.stats()},
+        "writer": writer.stats(),
+        "settings_cache": settings_cache.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "generations": generations.stats(),
+        "events": event_bus.stats(),
+        "catalog": catalog.stats()
+    })
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,121 @@
+"""
+Response Cache
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+Read endpoints whose results are the same for every caller (analytics) keep
+their JSON responses in process. An entry is served while it is younger than
+its action's TTL and none of the tables it reads has been written since it
+was computed (by any worker, see config/generations.py), so a new sale shows
+up on the next request instead of after the TTL. The TTL only bounds how
+long time-based windows ("today", "last 30 days") can lag behind the clock.
+
+Catalog endpoints instead let the client cache: conditional() tags responses
+with a strong ETag built from the table generations and answers a matching
+If-None-Match with 304 before the handler (and the database) runs.
+"""
+
+import threading
+import time
+import sys
+import os
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.generations import generations
+
+class ResponseCache:
+    """TTL + generation-checked cache of response bodies keyed by action and params"""
+
+    def __init__(self, tables, ttls, default_ttl=10, max_entries=256):
+        self._tables = tables
+        self._ttls = ttls
+        self._default_ttl = default_ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (generation, expires_at, body)
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(action, params):
+        """Normalize query params into a cache key (order and blanks ignored)"""
+        return (action,) + tuple(sorted(
+            (name, value) for name, value in params.items(multi=True)
+            if name not in ('action', '_') and value != ''
+        ))
+
+    def ttl(self, action):
+        return self._ttls.get(action, self._default_ttl)
+
+    def generation(self):
+        """Generations of the tables the cached responses depend on"""
+        return generations.values(self._tables)
+
+    def get(self, key):
+        """Return the cached body for key, or None if missing or stale"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                generation, expires_at, body = entry
+                if generation == self.generation() and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return body
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, key, generation, body):
+        """Store body computed while the tables were at `generation`"""
+        ttl = self.ttl(key[0])
+        if ttl <= 0:
+            return
+        with self._lock:
+            # Skip storing if a write landed while the response was built
+            if generation != self.generation():
+                return
+            self._entries[key] = (generation, time.monotonic() + ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return cache counters"""
+        with self._lock:
+            return {
+                'generation': dict(zip(self._tables, self.generation())),
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+def table_etag(tables):
+    """Strong ETag for data read from tables, as of their current generations"""
+    return '-'.join([f'{generations.epoch():x}'] + [str(value) for value in generations.values(tables)])
+
+def conditional(*tables):
+    """Decorator: ETag a handler's response and answer If-None-Match with 304"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Taken before the handler runs, so a write landing meanwhile only
+            # makes the tag older than the body, never newer
+            etag = table_etag(tables)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code == 200 and (response.get_json(silent=True) or {}).get('success'):
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
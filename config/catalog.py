@@ -0,0 +1,220 @@
+"""
+Product Catalog
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+Every worker keeps the product catalog in memory: one slotted record per
+product, dicts by id and barcode, and id lists per category in display
+order. Barcode scans and catalog browsing are answered from it without
+touching SQLite.
+
+The catalog is tagged with the 'products' and 'categories' generations it
+was loaded under (see config/generations.py). Any write to either table, in
+any worker, moves them, and the next read refreshes the catalog: product
+writes are applied incrementally by reading only the rows whose row_version
+is newer than the catalog's (see migration 11), while category writes reload
+everything since they rename products' categories. A loaded catalog is never
+modified, only replaced, so readers need no lock.
+"""
+
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.generations import generations
+
+TABLES = ('products', 'categories')
+
+class ProductRecord:
+    """One products row with its category name"""
+
+    # products columns in table order, as SELECT p.* returns them
+    COLUMNS = ('id', 'name', 'description', 'category_id', 'price', 'stock_quantity',
+               'unit', 'barcode', 'is_active', 'created_at', 'updated_at', 'row_version')
+    __slots__ = COLUMNS + ('category_name',)
+
+    def __init__(self, values):
+        # Unpacked positionally from a plain tuple: name lookups on
+        # sqlite3.Row dominate load time for a large catalog
+        (self.id, self.name, self.description, self.category_id, self.price,
+         self.stock_quantity, self.unit, self.barcode, is_active,
+         self.created_at, self.updated_at, self.row_version, self.category_name) = values
+        self.is_active = bool(is_active)
+
+    def to_dict(self):
+        """The product as list_products returns it"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class CatalogSnapshot:
+    """Immutable indexes over one load of the catalog"""
+
+    __slots__ = ('version', 'by_id', 'by_barcode', 'by_category', 'ordered')
+
+    def __init__(self, version, records):
+        self.version = version
+        # Same order as ORDER BY p.name (BINARY compares UTF-8 bytes, which
+        # sort like code points); ids break ties deterministically. Refreshes
+        # pass records mostly in this order already, which sorts in linear time
+        records = sorted(records, key=lambda record: (record.name, record.id))
+        self.by_id = {record.id: record for record in records}
+        self.ordered = [record.id for record in records]
+        self.by_category = {}
+        self.by_barcode = {}
+        for record in records:
+            self.by_category.setdefault(record.category_id, []).append(record.id)
+            if record.barcode:
+                # An active product wins a barcode shared with inactive ones
+                current = self.by_barcode.get(record.barcode)
+                if current is None or (record.is_active and not current.is_active):
+                    self.by_barcode[record.barcode] = record
+
+    def replace(self, version, changed):
+        """New snapshot with changed records swapped in, or None if the order
+        or indexes would change (new, renamed, moved or (de)activated products)"""
+        by_id = dict(self.by_id)
+        by_barcode = dict(self.by_barcode)
+        for record in changed:
+            current = by_id.get(record.id)
+            if current is None or (current.name, current.category_id, current.barcode, current.is_active) != \
+                    (record.name, record.category_id, record.barcode, record.is_active):
+                return None
+            by_id[record.id] = record
+            if by_barcode.get(record.barcode) is current:
+                by_barcode[record.barcode] = record
+
+        # Stock and price updates (every sale) keep the order and the
+        # category lists, which are shared with this snapshot
+        snapshot = CatalogSnapshot.__new__(CatalogSnapshot)
+        snapshot.version = version
+        snapshot.by_id = by_id
+        snapshot.by_barcode = by_barcode
+        snapshot.by_category = self.by_category
+        snapshot.ordered = self.ordered
+        return snapshot
+
+    def products(self, category_id=None, active_only=True):
+        """Records in name order, optionally for one category"""
+        ids = self.ordered if category_id is None else self.by_category.get(category_id, ())
+        records = [self.by_id[product_id] for product_id in ids]
+        if active_only:
+            records = [record for record in records if record.is_active]
+        return records
+
+    def scan(self, barcode):
+        """Active product with this exact barcode, or None"""
+        record = self.by_barcode.get(barcode)
+        return record if record is not None and record.is_active else None
+
+class ProductCatalog:
+    """Per-process catalog, refreshed whenever products or categories change"""
+
+    def __init__(self):
+        self._load_lock = threading.Lock()
+        self._entry = (None, None)  # (generation, snapshot)
+        self._loads = 0
+        self._refreshes = 0
+        self._load_ms = 0.0
+
+    def get(self, conn=None):
+        """Return the current snapshot, reading from conn only if it is stale"""
+        generation = generations.values(TABLES)
+        cached_generation, snapshot = self._entry
+        if cached_generation == generation:
+            return snapshot
+
+        # One thread reloads; the others wait for it instead of all reading
+        with self._load_lock:
+            cached_generation, snapshot = self._entry
+            if cached_generation == generations.values(TABLES):
+                return snapshot
+            if snapshot is not None and cached_generation[1] == generations.value('categories'):
+                return self.refresh(snapshot, conn)
+            return self.load(conn)
+
+    def load(self, conn=None):
+        """Read the whole catalog and make it current"""
+        return self._read(conn, None)
+
+    def refresh(self, snapshot, conn=None):
+        """Apply product rows written since snapshot and make the result current"""
+        return self._read(conn, snapshot)
+
+    def _read(self, conn, previous):
+        from config.database import get_read_db, read_generations
+        if conn is None:
+            conn = get_read_db()
+
+        started = time.perf_counter()
+        # Both taken before reading rows, so a write landing meanwhile is
+        # picked up by the next refresh instead of being skipped (inside a
+        # batch, the generations from before its snapshot was opened)
+        generation = read_generations(TABLES)
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT version FROM catalog_version WHERE id = 1")
+        version = cursor.fetchone()[0]
+
+        sql = f"""
+            SELECT {', '.join('p.' + name for name in ProductRecord.COLUMNS)}, c.name
+            FROM products p
+            LEFT JOIN categories c ON p.category_id = c.id
+        """
+        if previous is None:
+            cursor.execute(sql)
+            snapshot = CatalogSnapshot(version, [ProductRecord(values) for values in cursor.fetchall()])
+        else:
+            cursor.execute(sql + " WHERE p.row_version > ?", (previous.version,))
+            changed = [ProductRecord(values) for values in cursor.fetchall()]
+            cursor.execute("""
+                SELECT row_id FROM catalog_tombstones
+                WHERE table_name = 'products' AND row_version > ?
+            """, (previous.version,))
+            deleted = [product_id for (product_id,) in cursor.fetchall()]
+            snapshot = None if deleted else previous.replace(version, changed)
+            if snapshot is None:
+                by_id = dict(previous.by_id)
+                for record in changed:
+                    by_id[record.id] = record
+                for product_id in deleted:
+                    by_id.pop(product_id, None)
+                snapshot = CatalogSnapshot(version, by_id.values())
+        cursor.close()
+
+        self._entry = (generation, snapshot)
+        if previous is None:
+            self._loads += 1
+        else:
+            self._refreshes += 1
+        self._load_ms = round((time.perf_counter() - started) * 1000, 2)
+        return snapshot
+
+    def stats(self):
+        """Return catalog counters"""
+        generation, snapshot = self._entry
+        return {
+            'generation': dict(zip(TABLES, generation)) if generation else None,
+            'version': snapshot.version if snapshot else None,
+            'products': len(snapshot.by_id) if snapshot else 0,
+            'barcodes': len(snapshot.by_barcode) if snapshot else 0,
+            'loads': self._loads,
+            'refreshes': self._refreshes,
+            'last_load_ms': self._load_ms
+        }
+
+catalog = ProductCatalog()
+
+def benchmark_scans(snapshot, count=1_000_000):
+    """Time count barcode lookups against snapshot; returns scans per second"""
+    barcodes = list(snapshot.by_barcode) or ['']
+    # Mix hits with misses (unknown codes), as a real scanner sees
+    probes = [barcodes[i % len(barcodes)] if i % 10 else f'{i:013d}' for i in range(1000)]
+    scan = snapshot.scan
+
+    rounds = max(1, count // len(probes))
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for barcode in probes:
+            scan(barcode)
+    elapsed = time.perf_counter() - started
+    return rounds * len(probes) / elapsed
@@ -5,28 +5,237 @@ Python/Flask Backend - SQLite Version
 """
 
 import sqlite3
-import bcrypt
 import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 from functools import wraps
+from urllib.request import pathname2url
+from flask import g, has_app_context
+
+from config.generations import generations
 
 # Database file path
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'billmaster.db')
 
-def get_connection():
-    """Create and return database connection"""
+# Connection pool tuning
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+STATEMENT_CACHE_SIZE = 256
+
+def _has_fts5():
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # Enable dict-like access
-        
-        # Create tables if not exist
-        create_tables(conn)
-        
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(body)")
+        conn.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+# Full-text product search needs SQLite built with FTS5 (standard builds are)
+HAS_FTS5 = _has_fts5()
+
+# Storage profile applied to every connection. The database runs in WAL mode
+# so readers never block the writer and the writer never blocks readers.
+PRAGMAS = [
+    ('synchronous', 'NORMAL'),      # Durable with WAL; fsync only at checkpoints
+    ('cache_size', '-16000'),       # ~16 MB page cache per connection
+    ('mmap_size', '268435456'),     # 256 MB memory-mapped reads
+    ('busy_timeout', '5000'),       # Wait up to 5s for a lock instead of failing
+    ('temp_store', 'MEMORY'),
+]
+
+def _apply_pragmas(conn):
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+
+def open_connection():
+    """Open a new read-write database connection"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row  # Enable dict-like access
+    conn.execute("PRAGMA journal_mode = WAL")
+    _apply_pragmas(conn)
+    return conn
+
+def open_read_connection():
+    """Open a new read-only database connection"""
+    uri = f"file:{pathname2url(DB_PATH)}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    _apply_pragmas(conn)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+class ConnectionPool:
+    """Process-wide pool of reusable SQLite connections.
+
+    Connections are handed to one thread at a time and returned to the pool
+    when the request ends. The pool is reset automatically after a fork so
+    gunicorn workers never share a connection with their parent.
+    """
+
+    def __init__(self, factory, max_size=POOL_SIZE):
+        self._factory = factory
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+        self._in_use = 0
+        self._created = 0
+        self._reused = 0
+        self._discarded = 0
+
+    def _check_fork(self):
+        # Connections inherited from a parent process must not be reused
+        if self._pid != os.getpid():
+            self._idle = []
+            self._in_use = 0
+            self._pid = os.getpid()
+
+    def acquire(self):
+        """Check out a connection, creating one if none are idle"""
+        with self._lock:
+            self._check_fork()
+            self._in_use += 1
+            if self._idle:
+                self._reused += 1
+                return self._idle.pop()
+        try:
+            conn = self._factory()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+            raise
+        with self._lock:
+            self._created += 1
         return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        keep = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            keep = False
+        
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._in_use = max(0, self._in_use - 1)
+            if keep and len(self._idle) < self._max_size:
+                self._idle.append(conn)
+                return
+            self._discarded += 1
+        conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Return pool usage counters"""
+        with self._lock:
+            return {
+                'max_size': self._max_size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'created': self._created,
+                'reused': self._reused,
+                'discarded': self._discarded
+            }
+
+pool = ConnectionPool(open_connection)
+read_pool = ConnectionPool(open_read_connection)
+
+def get_db():
+    """Return the pooled read-write connection bound to the current request"""
+    if 'db' not in g:
+        try:
+            g.db = pool.acquire()
+        except Exception as e:
+            print(f"Database connection error: {e}")
+            return None
+    return g.db
+
+def get_read_db():
+    """Return the pooled read-only connection bound to the current request"""
+    if 'read_db' not in g:
+        try:
+            g.read_db = read_pool.acquire()
+        except Exception as e:
+            print(f"Database connection error: {e}")
+            return None
+    return g.read_db
+
+def read_generations(tables):
+    """Generations to tag data read now through get_read_db() with.
+
+    Inside /api/batch that connection holds a snapshot opened before the
+    current generations may have moved, so use the ones the batch took
+    before opening it; a cache then never files old rows as current.
+    """
+    taken = g.get('batch_generations') if has_app_context() else None
+    if taken is None:
+        return generations.values(tables)
+    return tuple(taken[table] for table in tables)
+
+def close_db(exc=None):
+    """Return the request connections to their pools (registered as teardown)"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn)
+    conn = g.pop('read_db', None)
+    if conn is not None:
+        read_pool.release(conn)
+
+def init_app(app):
+    """Bind the connection pool to the Flask request lifecycle"""
+    app.teardown_appcontext(close_db)
+
+def get_connection():
+    """Create and return a standalone database connection (outside request scope)"""
+    try:
+        return open_connection()
         
     except Exception as e:
         print(f"Database connection error: {e}")
         return None
 
+@contextmanager
+def scratch_database():
+    """Point this process at a throwaway copy of the database (for benchmarks).
+
+    Pooled connections and the group-commit writer open the copy as long as
+    they had not connected yet. Generation bumps still reach the real
+    database's counters, which only costs other workers a cache refresh.
+    """
+    global DB_PATH
+    original = DB_PATH
+    directory = tempfile.mkdtemp(prefix='billmaster-')
+    path = os.path.join(directory, os.path.basename(original))
+    source = sqlite3.connect(original)
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    pool.close_all()
+    read_pool.close_all()
+    DB_PATH = path
+    try:
+        yield path
+    finally:
+        pool.close_all()
+        read_pool.close_all()
+        DB_PATH = original
+        shutil.rmtree(directory, ignore_errors=True)
+
 def dict_from_row(row):
     """Convert sqlite3.Row to dictionary"""
     if row is None:
@@ -37,199 +246,83 @@ def dict_list_from_rows(rows):
     """Convert list of sqlite3.Row to list of dictionaries"""
     return [dict(row) for row in rows]
 
-def create_tables(conn):
-    """Create all required tables"""
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            full_name TEXT NOT NULL,
-            email TEXT,
-            role TEXT DEFAULT 'staff' CHECK(role IN ('admin', 'staff')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Categories table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Products table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            category_id INTEGER,
-            price REAL NOT NULL,
-            stock_quantity INTEGER DEFAULT 0,
-            unit TEXT DEFAULT 'pcs',
-            barcode TEXT,
-            is_active INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
-        )
-    """)
-    
-    # Customers table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS customers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT,
-            phone TEXT,
-            address TEXT,
-            city TEXT,
-            customer_type TEXT DEFAULT 'individual' CHECK(customer_type IN ('individual', 'business', 'institute')),
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Invoices table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS invoices (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            invoice_number TEXT UNIQUE NOT NULL,
-            customer_id INTEGER,
-            user_id INTEGER,
-            subtotal REAL NOT NULL,
-            tax_rate REAL DEFAULT 0,
-            tax_amount REAL DEFAULT 0,
-            discount_amount REAL DEFAULT 0,
-            total_amount REAL NOT NULL,
-            payment_method TEXT DEFAULT 'cash' CHECK(payment_method IN ('cash', 'card', 'upi', 'bank_transfer', 'credit')),
-            payment_status TEXT DEFAULT 'pending' CHECK(payment_status IN ('paid', 'pending', 'partial', 'cancelled')),
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE SET NULL,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
-        )
-    """)
-    
-    # Invoice items table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS invoice_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            invoice_id INTEGER NOT NULL,
-            product_id INTEGER,
-            product_name TEXT NOT NULL,
-            quantity INTEGER NOT NULL,
-            unit_price REAL NOT NULL,
-            total_price REAL NOT NULL,
-            FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE,
-            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE SET NULL
-        )
-    """)
-    
-    # Settings table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS settings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            setting_key TEXT UNIQUE NOT NULL,
-            setting_value TEXT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    conn.commit()
-    
-    # Insert default admin user if not exists
-    cursor.execute("SELECT id FROM users WHERE username = 'admin'")
-    if cursor.fetchone() is None:
-        hashed_password = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        cursor.execute("""
-            INSERT INTO users (username, password, full_name, email, role) 
-            VALUES (?, ?, ?, ?, ?)
-        """, ('admin', hashed_password, 'Administrator', 'admin@billmaster.com', 'admin'))
-        conn.commit()
-    
-    # Insert default settings if not exists
-    default_settings = [
-        ('business_name', 'BillMaster Pro'),
-        ('business_address', '123 Business Street, City'),
-        ('business_phone', '+91 9876543210'),
-        ('business_email', 'contact@billmaster.com'),
-        ('tax_rate', '18'),
-        ('currency_symbol', '₹'),
-        ('invoice_prefix', 'INV')
-    ]
-    
-    for key, value in default_settings:
-        cursor.execute("SELECT id FROM settings WHERE setting_key = ?", (key,))
-        if cursor.fetchone() is None:
-            cursor.execute("INSERT INTO settings (setting_key, setting_value) VALUES (?, ?)", (key, value))
-    
-    conn.commit()
-    
-    # Insert sample categories if empty
-    cursor.execute("SELECT id FROM categories LIMIT 1")
-    if cursor.fetchone() is None:
-        sample_categories = [
-            ('Beverages', 'Tea, Coffee, Soft Drinks, Juices'),
-            ('Snacks', 'Chips, Biscuits, Namkeen'),
-            ('Meals', 'Breakfast, Lunch, Dinner items'),
-            ('Stationery', 'Pens, Notebooks, Files'),
-            ('Services', 'Printing, Xerox, Lamination')
-        ]
-        for name, description in sample_categories:
-            cursor.execute("INSERT INTO categories (name, description) VALUES (?, ?)", (name, description))
-        conn.commit()
+class SettingsCache:
+    """In-process copy of the settings table.
+
+    Every write bumps the shared 'settings' generation; a cached copy is only
+    served while its generation is current, so readers never see settings
+    older than the last invalidate() in any worker process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry = (-1, None)  # (generation, settings)
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, conn=None):
+        """Return a copy of all settings, reading from conn only on a miss"""
+        generation = generations.value('settings')
+        cached_generation, settings = self._entry
+        if cached_generation == generation:
+            self._hits += 1
+            return dict(settings)
         
-        # Insert sample products
-        sample_products = [
-            ('Tea', 'Hot tea', 1, 15.00, 100, 'cups'),
-            ('Coffee', 'Hot coffee', 1, 20.00, 100, 'cups'),
-            ('Samosa', 'Potato samosa', 2, 10.00, 50, 'pcs'),
-            ('Sandwich', 'Veg sandwich', 3, 40.00, 30, 'pcs'),
-            ('Notebook', 'Ruled notebook', 4, 30.00, 100, 'pcs'),
-            ('Pen', 'Ball pen', 4, 10.00, 200, 'pcs'),
-            ('Printing', 'B/W printing', 5, 2.00, 1000, 'pages'),
-            ('Xerox', 'Document xerox', 5, 1.00, 1000, 'pages')
-        ]
-        for name, desc, cat_id, price, stock, unit in sample_products:
-            cursor.execute("""
-                INSERT INTO products (name, description, category_id, price, stock_quantity, unit) 
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (name, desc, cat_id, price, stock, unit))
-        conn.commit()
-    
-    cursor.close()
+        self._misses += 1
+        # Within a batch this is older than `generation`, so nothing is stored
+        generation, = read_generations(('settings',))
+        cursor = (conn or get_read_db()).cursor()
+        cursor.execute("SELECT setting_key, setting_value FROM settings")
+        settings = {row['setting_key']: row['setting_value'] for row in cursor.fetchall()}
+        cursor.close()
+        
+        with self._lock:
+            # Skip storing if a write landed while we were reading
+            if generations.value('settings') == generation:
+                self._entry = (generation, settings)
+        return dict(settings)
 
-def get_settings(conn):
-    """Get all settings as dictionary"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT setting_key, setting_value FROM settings")
-    settings = {row['setting_key']: row['setting_value'] for row in cursor.fetchall()}
-    cursor.close()
-    return settings
+    def invalidate(self):
+        """Discard the cached copy after a settings write (in every process)"""
+        generations.bump('settings')
 
-def generate_invoice_number(conn):
-    """Generate unique invoice number"""
+    def stats(self):
+        """Return cache counters"""
+        return {'generation': generations.value('settings'), 'hits': self._hits, 'misses': self._misses}
+
+settings_cache = SettingsCache()
+
+def get_settings(conn=None):
+    """Get all settings as dictionary (cached; conn defaults to the request read connection)"""
+    return settings_cache.get(conn)
+
+def reserve_invoice_numbers(conn, count):
+    """Allocate the next count invoice numbers for today's prefix sequence.
+
+    Must run inside the caller's write transaction: the upsert takes SQLite's
+    write lock, so numbers stay unique across threads and gunicorn workers.
+    """
     from datetime import datetime
     
+    if count <= 0:
+        return []
+    
     settings = get_settings(conn)
     prefix = settings.get('invoice_prefix', 'INV')
     date_str = datetime.now().strftime('%Y%m%d')
     
     cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) as count FROM invoices WHERE DATE(created_at) = DATE('now')")
-    result = cursor.fetchone()
-    count = (result['count'] if result else 0) + 1
+    cursor.execute("""
+        INSERT INTO invoice_sequences (prefix, seq_date, last_value) VALUES (?, ?, ?)
+        ON CONFLICT(prefix, seq_date) DO UPDATE SET last_value = last_value + excluded.last_value
+    """, (prefix, date_str, count))
+    cursor.execute("SELECT last_value FROM invoice_sequences WHERE prefix = ? AND seq_date = ?",
+                   (prefix, date_str))
+    last = cursor.fetchone()['last_value']
     cursor.close()
     
-    return f"{prefix}-{date_str}-{str(count).zfill(4)}"
+    return [f"{prefix}-{date_str}-{str(value).zfill(4)}" for value in range(last - count + 1, last + 1)]
+
+def generate_invoice_number(conn):
+    """Allocate a single invoice number (see reserve_invoice_numbers)"""
+    return reserve_invoice_numbers(conn, 1)[0]
@@ -0,0 +1,131 @@
+"""
+Event Bus
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+In-process publish/subscribe for live dashboard updates. Write handlers
+publish small events after their transaction commits; /api/stream hands
+them to connected dashboards as Server-Sent Events.
+
+Recent events are kept in a ring buffer so a reconnecting client can resume
+from its Last-Event-ID. Event ids are "<epoch>-<seq>" where the epoch is
+random per process: a client that reconnects to another gunicorn worker, or
+has fallen further behind than the buffer, gets a single 'refresh' event and
+reloads its data instead of replaying.
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+EVENT_HISTORY = 500
+LOW_STOCK_THRESHOLD = 10
+
+class EventBus:
+    """Publish/subscribe bus with a replay buffer"""
+
+    def __init__(self, history=EVENT_HISTORY):
+        self._history = history
+        self._cond = threading.Condition()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.epoch = secrets.token_hex(4)
+        self._seq = 0
+        self._events = deque(maxlen=self._history)  # (seq, type, data)
+
+    def _ensure_process(self):
+        # A forked worker starts with an empty buffer and its own epoch
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def publish(self, event_type, data):
+        """Add an event and wake every waiting subscriber; returns its seq"""
+        self._ensure_process()
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event_type, data))
+            self._cond.notify_all()
+            return self._seq
+
+    def last_seq(self):
+        self._ensure_process()
+        return self._seq
+
+    def parse_id(self, event_id):
+        """Return the seq of an event id from this process, or None"""
+        self._ensure_process()
+        epoch, _, seq = (event_id or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def format_id(self, seq):
+        return f'{self.epoch}-{seq}'
+
+    def wait(self, last_seq, timeout):
+        """Wait up to timeout for events after last_seq.
+
+        Returns (events, missed): events newer than last_seq, and whether some
+        were already dropped from the buffer.
+        """
+        self._ensure_process()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._seq <= last_seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], False
+                self._cond.wait(remaining)
+            events = [event for event in self._events if event[0] > last_seq]
+            missed = not events or events[0][0] > last_seq + 1
+            return events, missed
+
+    def stats(self):
+        """Return bus counters"""
+        return {'epoch': self.epoch, 'last_seq': self._seq, 'buffered': len(self._events)}
+
+event_bus = EventBus()
+
+def publish(event_type, data):
+    """Publish an event, never failing the write that triggered it"""
+    try:
+        event_bus.publish(event_type, data)
+    except Exception:
+        pass
+
+def publish_low_stock(conn, decreases, threshold=LOW_STOCK_THRESHOLD):
+    """Publish low_stock for products that just fell to the threshold.
+
+    decreases maps product id -> units removed by a committed write; a product
+    crossed the threshold if its stock was above it before that write.
+    """
+    decreases = {product_id: amount for product_id, amount in decreases.items() if amount > 0}
+    if not decreases:
+        return
+    try:
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(decreases))
+        cursor.execute(f"""
+            SELECT id, name, stock_quantity, unit FROM products
+            WHERE id IN ({placeholders}) AND is_active = 1 AND stock_quantity <= ?
+        """, (*decreases, threshold))
+        rows = cursor.fetchall()
+        cursor.close()
+    except Exception:
+        return
+
+    for row in rows:
+        if row['stock_quantity'] + decreases[row['id']] > threshold:
+            publish('low_stock', {
+                'id': row['id'],
+                'name': row['name'],
+                'stock_quantity': row['stock_quantity'],
+                'unit': row['unit'],
+                'threshold': threshold
+            })
@@ -0,0 +1,170 @@
+"""
+Table Generations
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+gunicorn runs several worker processes, each with its own in-process caches.
+To keep them coherent every worker maps the same small file next to the
+database (billmaster.db-gen) holding one 64-bit counter per table. A write
+bumps the counters of the tables it changed after it commits; caches remember
+the counters they were built under and drop entries once those move. Reading
+a counter is a load from the shared mapping, with no system call: forked
+workers drop the mapping they inherited in an at-fork hook rather than
+checking their pid on every read.
+
+Bumps are serialized across processes with flock. If the file cannot be
+mapped (e.g. a read-only filesystem) counters fall back to process-local
+memory, which keeps single-process deployments correct.
+
+The last slot of the file holds a random epoch written when the file is
+created. Counters restart from zero if the file is deleted, so anything
+handed to clients (ETags) includes the epoch as well.
+"""
+
+import mmap
+import os
+import secrets
+import struct
+import threading
+import weakref
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, single process only
+    fcntl = None
+
+# One counter slot per table; append new tables, never reorder
+TABLES = ('categories', 'customers', 'invoices', 'products', 'settings', 'users')
+
+GENERATIONS_SUFFIX = '-gen'
+_SLOT = struct.Struct('<Q')
+_FILE_SIZE = mmap.PAGESIZE
+_EPOCH_OFFSET = _FILE_SIZE - _SLOT.size
+
+class TableGenerations:
+    """Per-table write counters shared by every process using the database"""
+
+    def __init__(self, tables=TABLES, path=None):
+        self._index = {table: i for i, table in enumerate(tables)}
+        self._offsets = {table: i * _SLOT.size for i, table in enumerate(tables)}
+        self._path = path
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+        self._counters = None  # the mapping, or a private buffer without one
+        self._epoch = None
+        self._own = [0] * len(self._index)  # bumps made by this process
+        if hasattr(os, 'register_at_fork'):
+            instance = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: _forget_in_child(instance()))
+
+    def _forget(self):
+        # In a forked child: flock locks belong to the open file, so the
+        # inherited descriptor would be shared with the parent; map again
+        # on next use. The lock may have been held by a parent thread.
+        self._lock = threading.Lock()
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+        self._fd = self._map = self._counters = None
+        self._own = [0] * len(self._index)
+
+    def _ensure_open(self):
+        # Map lazily, on first use in each process
+        if self._counters is not None:
+            return
+        with self._lock:
+            if self._counters is not None:
+                return
+            try:
+                self._fd, self._map = self._open()
+                self._epoch = _SLOT.unpack_from(self._map, _EPOCH_OFFSET)[0]
+                self._counters = self._map
+            except (OSError, ValueError):
+                self._epoch = secrets.randbits(63) + 1
+                self._counters = bytearray(_FILE_SIZE)
+
+    def _open(self):
+        path = self._path
+        if path is None:
+            from config import database
+            path = database.DB_PATH + GENERATIONS_SUFFIX
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < _FILE_SIZE:
+                self._flock(fd, True)
+                try:
+                    if os.fstat(fd).st_size < _FILE_SIZE:
+                        # Writing the epoch into the last slot also sizes the file
+                        os.pwrite(fd, _SLOT.pack(secrets.randbits(63) + 1), _EPOCH_OFFSET)
+                finally:
+                    self._flock(fd, False)
+            return fd, mmap.mmap(fd, _FILE_SIZE)
+        except Exception:
+            os.close(fd)
+            raise
+
+    @staticmethod
+    def _flock(fd, exclusive):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_UN)
+
+    def value(self, table):
+        """Current generation of one table"""
+        try:
+            return _SLOT.unpack_from(self._counters, self._offsets[table])[0]
+        except TypeError:  # not mapped yet in this process
+            self._ensure_open()
+            return _SLOT.unpack_from(self._counters, self._offsets[table])[0]
+
+    def values(self, tables):
+        """Current generations of several tables, as a comparable tuple"""
+        counters, offsets = self._counters, self._offsets
+        try:
+            return tuple([_SLOT.unpack_from(counters, offsets[table])[0] for table in tables])
+        except TypeError:
+            self._ensure_open()
+            return self.values(tables)
+
+    def epoch(self):
+        """Random id of the counter file, changed whenever it is recreated"""
+        self._ensure_open()
+        return self._epoch
+
+    def bump(self, *tables):
+        """Mark tables as changed (call after the write has committed)"""
+        self._ensure_open()
+        slots = [self._index[table] for table in tables]
+        with self._lock:
+            for slot in slots:
+                self._own[slot] += 1
+            if self._map is not None:
+                self._flock(self._fd, True)
+            try:
+                for table in tables:
+                    offset = self._offsets[table]
+                    _SLOT.pack_into(self._counters, offset, _SLOT.unpack_from(self._counters, offset)[0] + 1)
+            finally:
+                if self._map is not None:
+                    self._flock(self._fd, False)
+
+    def snapshot(self, tables):
+        """Current generations of tables and how many of their bumps this
+        process made, read together so neither includes a half-done bump"""
+        self._ensure_open()
+        with self._lock:
+            return self.values(tables), tuple(self._own[self._index[table]] for table in tables)
+
+    def stats(self):
+        """Return the counters and whether they are shared between processes"""
+        self._ensure_open()
+        return {
+            'shared': self._map is not None,
+            'epoch': self._epoch,
+            **{table: self.value(table) for table in self._index}
+        }
+
+def _forget_in_child(instance):
+    if instance is not None:
+        instance._forget()
+
+generations = TableGenerations()
@@ -0,0 +1,560 @@
+"""
+Schema Migrations
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+Migrations are applied in order once at process start (or with
+`flask --app app migrate`), so the request path never runs DDL.
+Each step runs inside its own transaction and records its version in
+the schema_version table.
+"""
+
+import bcrypt
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import open_connection, HAS_FTS5
+from config.rollups import (rebuild_daily_sales, rebuild_customer_totals, rebuild_category_daily_sales,
+                            rebuild_product_daily_sales)
+
+def create_base_tables(cursor):
+    """Create the core tables"""
+    # Users table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            email TEXT,
+            role TEXT DEFAULT 'staff' CHECK(role IN ('admin', 'staff')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Categories table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Products table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            category_id INTEGER,
+            price REAL NOT NULL,
+            stock_quantity INTEGER DEFAULT 0,
+            unit TEXT DEFAULT 'pcs',
+            barcode TEXT,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
+        )
+    """)
+
+    # Customers table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            address TEXT,
+            city TEXT,
+            customer_type TEXT DEFAULT 'individual' CHECK(customer_type IN ('individual', 'business', 'institute')),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Invoices table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_number TEXT UNIQUE NOT NULL,
+            customer_id INTEGER,
+            user_id INTEGER,
+            subtotal REAL NOT NULL,
+            tax_rate REAL DEFAULT 0,
+            tax_amount REAL DEFAULT 0,
+            discount_amount REAL DEFAULT 0,
+            total_amount REAL NOT NULL,
+            payment_method TEXT DEFAULT 'cash' CHECK(payment_method IN ('cash', 'card', 'upi', 'bank_transfer', 'credit')),
+            payment_status TEXT DEFAULT 'pending' CHECK(payment_status IN ('paid', 'pending', 'partial', 'cancelled')),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE SET NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+        )
+    """)
+
+    # Invoice items table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS invoice_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL,
+            product_id INTEGER,
+            product_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            total_price REAL NOT NULL,
+            FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE,
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE SET NULL
+        )
+    """)
+
+    # Settings table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            setting_key TEXT UNIQUE NOT NULL,
+            setting_value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def seed_default_data(cursor):
+    """Insert default admin, settings and sample catalog"""
+    # Insert default admin user if not exists
+    cursor.execute("SELECT id FROM users WHERE username = 'admin'")
+    if cursor.fetchone() is None:
+        hashed_password = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        cursor.execute("""
+            INSERT INTO users (username, password, full_name, email, role)
+            VALUES (?, ?, ?, ?, ?)
+        """, ('admin', hashed_password, 'Administrator', 'admin@billmaster.com', 'admin'))
+
+    # Insert default settings if not exists
+    default_settings = [
+        ('business_name', 'BillMaster Pro'),
+        ('business_address', '123 Business Street, City'),
+        ('business_phone', '+91 9876543210'),
+        ('business_email', 'contact@billmaster.com'),
+        ('tax_rate', '18'),
+        ('currency_symbol', '₹'),
+        ('invoice_prefix', 'INV')
+    ]
+    cursor.executemany(
+        "INSERT OR IGNORE INTO settings (setting_key, setting_value) VALUES (?, ?)", default_settings
+    )
+
+    # Insert sample categories if empty
+    cursor.execute("SELECT id FROM categories LIMIT 1")
+    if cursor.fetchone() is None:
+        sample_categories = [
+            ('Beverages', 'Tea, Coffee, Soft Drinks, Juices'),
+            ('Snacks', 'Chips, Biscuits, Namkeen'),
+            ('Meals', 'Breakfast, Lunch, Dinner items'),
+            ('Stationery', 'Pens, Notebooks, Files'),
+            ('Services', 'Printing, Xerox, Lamination')
+        ]
+        cursor.executemany("INSERT INTO categories (name, description) VALUES (?, ?)", sample_categories)
+
+        # Insert sample products
+        sample_products = [
+            ('Tea', 'Hot tea', 1, 15.00, 100, 'cups'),
+            ('Coffee', 'Hot coffee', 1, 20.00, 100, 'cups'),
+            ('Samosa', 'Potato samosa', 2, 10.00, 50, 'pcs'),
+            ('Sandwich', 'Veg sandwich', 3, 40.00, 30, 'pcs'),
+            ('Notebook', 'Ruled notebook', 4, 30.00, 100, 'pcs'),
+            ('Pen', 'Ball pen', 4, 10.00, 200, 'pcs'),
+            ('Printing', 'B/W printing', 5, 2.00, 1000, 'pages'),
+            ('Xerox', 'Document xerox', 5, 1.00, 1000, 'pages')
+        ]
+        cursor.executemany("""
+            INSERT INTO products (name, description, category_id, price, stock_quantity, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, sample_products)
+
+def create_performance_indexes(cursor):
+    """Create the indexes listed in database/schema.sql"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_active ON products(is_active)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_customer ON invoices(customer_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_status ON invoices(payment_status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items(invoice_id)")
+
+def create_invoice_sequences(cursor):
+    """Per-prefix, per-day invoice number counters, seeded from existing invoices"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS invoice_sequences (
+            prefix TEXT NOT NULL,
+            seq_date TEXT NOT NULL,
+            last_value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (prefix, seq_date)
+        ) WITHOUT ROWID
+    """)
+
+    # Existing numbers look like PREFIX-YYYYMMDD-NNNN
+    counters = {}
+    cursor.execute("SELECT invoice_number FROM invoices")
+    for (invoice_number,) in cursor.fetchall():
+        parts = invoice_number.rsplit('-', 2)
+        if len(parts) != 3 or not parts[1].isdigit() or not parts[2].isdigit():
+            continue
+        key = (parts[0], parts[1])
+        counters[key] = max(counters.get(key, 0), int(parts[2]))
+
+    cursor.executemany("""
+        INSERT INTO invoice_sequences (prefix, seq_date, last_value) VALUES (?, ?, ?)
+        ON CONFLICT(prefix, seq_date) DO UPDATE SET last_value = MAX(last_value, excluded.last_value)
+    """, [(prefix, seq_date, value) for (prefix, seq_date), value in counters.items()])
+
+def add_invoice_idempotency_key(cursor):
+    """Client-supplied keys so retried offline uploads never duplicate invoices"""
+    cursor.execute("ALTER TABLE invoices ADD COLUMN idempotency_key TEXT")
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_invoices_idempotency 
+        ON invoices(idempotency_key) WHERE idempotency_key IS NOT NULL
+    """)
+
+def create_daily_sales(cursor):
+    """Per day x payment method x payment status sales rollup"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            sale_date TEXT NOT NULL,
+            payment_method TEXT NOT NULL,
+            payment_status TEXT NOT NULL,
+            invoice_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            items_sold INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, payment_method, payment_status)
+        ) WITHOUT ROWID
+    """)
+    rebuild_daily_sales(cursor)
+
+def create_invoice_list_indexes(cursor):
+    """(filter, created_at, id) indexes for keyset-paginated invoice lists"""
+    # Each replaces a single-column index that is now its prefix
+    cursor.execute("DROP INDEX IF EXISTS idx_invoices_date")
+    cursor.execute("DROP INDEX IF EXISTS idx_invoices_customer")
+    cursor.execute("DROP INDEX IF EXISTS idx_invoices_status")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_created ON invoices(created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_customer_created ON invoices(customer_id, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_user_created ON invoices(user_id, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_status_created ON invoices(payment_status, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_method_created ON invoices(payment_method, created_at, id)")
+
+def create_customer_name_index(cursor):
+    """(name, id) index for keyset-paginated customer lists"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(name, id)")
+
+def create_product_search(cursor):
+    """FTS5 index over product text kept in sync by triggers, plus a barcode index"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_barcode ON products(barcode)")
+    if not HAS_FTS5:
+        return  # list_products falls back to LIKE
+    
+    # External-content table: the text lives in products, the index in products_fts
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, description, barcode,
+            content='products', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name, description, barcode)
+            VALUES (new.id, new.name, new.description, new.barcode);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description, barcode)
+            VALUES ('delete', old.id, old.name, old.description, old.barcode);
+        END
+    """)
+    # Only text changes touch the index; stock updates from sales do not
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description, barcode ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description, barcode)
+            VALUES ('delete', old.id, old.name, old.description, old.barcode);
+            INSERT INTO products_fts (rowid, name, description, barcode)
+            VALUES (new.id, new.name, new.description, new.barcode);
+        END
+    """)
+    cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+# Phone number with common separators removed. The customer search query
+# must use this exact expression for SQLite to use idx_customers_phone_digits.
+PHONE_DIGITS_SQL = (
+    "replace(replace(replace(replace(replace(replace("
+    "phone, ' ', ''), '-', ''), '(', ''), ')', ''), '+', ''), '.', '')"
+)
+# Its last 10 digits: the national number of a phone stored with a country
+# code ("+91 98765-43210"), for idx_customers_phone_local
+PHONE_LOCAL_SQL = f"substr({PHONE_DIGITS_SQL}, -10)"
+
+def create_customer_search(cursor):
+    """Normalized-phone index and FTS5 index over customer name and email"""
+    # Typeahead queries are prefixes of up to a word's length: indexing
+    # prefixes to 6 characters keeps common surnames from merging thousands
+    # of doclist entries per keystroke
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_customers_phone_digits ON customers({PHONE_DIGITS_SQL})")
+    if not HAS_FTS5:
+        return  # the customer search falls back to LIKE
+    
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+            name, email,
+            content='customers', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS customers_fts_insert AFTER INSERT ON customers BEGIN
+            INSERT INTO customers_fts (rowid, name, email) VALUES (new.id, new.name, new.email);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS customers_fts_delete AFTER DELETE ON customers BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, name, email)
+            VALUES ('delete', old.id, old.name, old.email);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS customers_fts_update AFTER UPDATE OF name, email ON customers BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, name, email)
+            VALUES ('delete', old.id, old.name, old.email);
+            INSERT INTO customers_fts (rowid, name, email) VALUES (new.id, new.name, new.email);
+        END
+    """)
+    cursor.execute("INSERT INTO customers_fts (customers_fts) VALUES ('rebuild')")
+
+def create_catalog_versions(cursor):
+    """Row versions on products and categories for catalog delta sync.
+
+    catalog_version holds one counter shared by both tables. Triggers bump it
+    on every insert, update or delete and stamp the row with the new value
+    (products also get a fresh updated_at), so every write path is covered,
+    including stock decrements from invoices. Deleted rows leave a tombstone
+    carrying the version of the delete.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_tombstones (
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            row_version INTEGER NOT NULL,
+            PRIMARY KEY (table_name, row_id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_catalog_tombstones_version ON catalog_tombstones(row_version)")
+    
+    for table in ('products', 'categories'):
+        # Existing rows start at version 1, the initial counter value
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_row_version ON {table}(row_version)")
+        
+        touch = ", updated_at = CURRENT_TIMESTAMP" if table == 'products' else ""
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_version_insert AFTER INSERT ON {table} BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                UPDATE {table} SET row_version = (SELECT version FROM catalog_version WHERE id = 1)
+                WHERE id = new.id;
+            END
+        """)
+        # The WHEN clause skips the stamping update itself
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_version_update AFTER UPDATE ON {table}
+            WHEN new.row_version IS old.row_version BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                UPDATE {table} SET row_version = (SELECT version FROM catalog_version WHERE id = 1){touch}
+                WHERE id = new.id;
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_version_delete AFTER DELETE ON {table} BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                INSERT OR REPLACE INTO catalog_tombstones (table_name, row_id, row_version)
+                VALUES ('{table}', old.id, (SELECT version FROM catalog_version WHERE id = 1));
+            END
+        """)
+
+def add_customer_totals(cursor):
+    """Order totals stored on customers instead of aggregated per request"""
+    cursor.execute("ALTER TABLE customers ADD COLUMN total_orders INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE customers ADD COLUMN total_spent REAL NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE customers ADD COLUMN last_order_at TIMESTAMP")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_customers_spent ON customers(total_spent)")
+    rebuild_customer_totals(cursor)
+
+def create_category_rollups(cursor):
+    """Active product counts on categories and a per day x category sales rollup"""
+    cursor.execute("ALTER TABLE categories ADD COLUMN product_count INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("""
+        UPDATE categories SET product_count = (
+            SELECT COUNT(*) FROM products WHERE category_id = categories.id AND is_active = 1
+        )
+    """)
+    
+    # Kept by triggers so every product write path moves the counts
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_count_insert AFTER INSERT ON products
+        WHEN new.is_active = 1 BEGIN
+            UPDATE categories SET product_count = product_count + 1 WHERE id = new.category_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_count_delete AFTER DELETE ON products
+        WHEN old.is_active = 1 BEGIN
+            UPDATE categories SET product_count = product_count - 1 WHERE id = old.category_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_count_update AFTER UPDATE OF category_id, is_active ON products
+        WHEN old.category_id IS NOT new.category_id OR old.is_active IS NOT new.is_active BEGIN
+            UPDATE categories SET product_count = product_count - 1
+            WHERE id = old.category_id AND old.is_active = 1;
+            UPDATE categories SET product_count = product_count + 1
+            WHERE id = new.category_id AND new.is_active = 1;
+        END
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS category_daily_sales (
+            sale_date TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            line_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, category_id)
+        ) WITHOUT ROWID
+    """)
+    rebuild_category_daily_sales(cursor)
+
+def create_product_daily_sales(cursor):
+    """Per day x product sales rollup for top products"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_daily_sales (
+            sale_date TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            unit_price_sum REAL NOT NULL DEFAULT 0,
+            line_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, product_id)
+        ) WITHOUT ROWID
+    """)
+    rebuild_product_daily_sales(cursor)
+
+def add_item_categories(cursor):
+    """Record each invoice line's category as of the sale"""
+    cursor.execute("ALTER TABLE invoice_items ADD COLUMN category_id INTEGER")
+    # Older lines can only take their product's current category
+    cursor.execute("""
+        UPDATE invoice_items SET category_id = (
+            SELECT category_id FROM products WHERE id = invoice_items.product_id
+        )
+    """)
+    rebuild_category_daily_sales(cursor)
+
+def create_customer_local_phone_index(cursor):
+    """Index phones by national number so searches skip country codes"""
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_customers_phone_local ON customers({PHONE_LOCAL_SQL})")
+
+# Ordered list of (version, description, step). Never edit or reorder an
+# applied step; append a new one instead.
+MIGRATIONS = [
+    (1, 'Create base tables', create_base_tables),
+    (2, 'Seed default data', seed_default_data),
+    (3, 'Create performance indexes', create_performance_indexes),
+    (4, 'Create invoice number sequences', create_invoice_sequences),
+    (5, 'Add invoice idempotency keys', add_invoice_idempotency_key),
+    (6, 'Create daily sales rollup', create_daily_sales),
+    (7, 'Create invoice list indexes', create_invoice_list_indexes),
+    (8, 'Create customer name index', create_customer_name_index),
+    (9, 'Create product search index', create_product_search),
+    (10, 'Create customer search indexes', create_customer_search),
+    (11, 'Add catalog row versions', create_catalog_versions),
+    (12, 'Add customer order totals', add_customer_totals),
+    (13, 'Add category product counts and sales rollup', create_category_rollups),
+    (14, 'Create product daily sales rollup', create_product_daily_sales),
+    (15, 'Add invoice item categories', add_item_categories),
+    (16, 'Create customer local phone index', create_customer_local_phone_index),
+]
+
+# How long a worker waits for another one to finish migrating. Backfill
+# steps on a large database take far longer than the usual busy_timeout.
+MIGRATION_BUSY_TIMEOUT_MS = int(os.environ.get('MIGRATION_BUSY_TIMEOUT_MS', 30 * 60 * 1000))
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a fresh database)"""
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def migrate(conn=None):
+    """Apply pending migrations and return the list of versions applied"""
+    own_conn = conn is None
+    if own_conn:
+        conn = open_connection()
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None  # Manage transactions explicitly
+    previous_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+    conn.execute(f"PRAGMA busy_timeout = {MIGRATION_BUSY_TIMEOUT_MS}")
+    applied = []
+
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Up to date: don't queue for the write lock at all
+        if get_schema_version(conn) >= MIGRATIONS[-1][0]:
+            return applied
+
+        for version, description, step in MIGRATIONS:
+            # BEGIN IMMEDIATE serializes concurrent workers starting together;
+            # the version is re-checked under the write lock.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if get_schema_version(conn) >= version:
+                    conn.execute("COMMIT")
+                    continue
+                cursor = conn.cursor()
+                step(cursor)
+                cursor.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                               (version, description))
+                cursor.close()
+                conn.execute("COMMIT")
+                applied.append(version)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.isolation_level = previous_isolation
+        conn.execute(f"PRAGMA busy_timeout = {previous_timeout}")
+        if own_conn:
+            conn.close()
+
+    return applied
+
+if __name__ == '__main__':
+    versions = migrate()
+    if versions:
+        print(f"Applied migrations: {', '.join(str(v) for v in versions)}")
+    else:
+        print("Database schema is up to date")
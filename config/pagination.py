@@ -0,0 +1,45 @@
+"""
+Keyset Pagination
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+List endpoints page with opaque cursors instead of OFFSET. A cursor encodes
+the sort key of the last row returned; the next page starts strictly after
+it with a row-value comparison such as (created_at, id) < (?, ?), which an
+index on the same columns answers by seeking, so every page costs the same
+however deep it is.
+"""
+
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def page_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a requested page size"""
+    if value is None:
+        return default
+    return max(1, min(int(value), maximum))
+
+def encode_cursor(*values):
+    """Opaque cursor for the sort key of the last row on a page"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token, size):
+    """Sort key values from a cursor (raises ValueError if malformed)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+def paginate(rows, limit, key):
+    """Split limit + 1 fetched rows into (page, next_cursor)"""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
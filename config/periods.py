@@ -0,0 +1,71 @@
+"""
+Date Ranges
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+Period filters are half-open [start, end) ranges of 'YYYY-MM-DD' strings
+computed in Python. Comparing the raw column (created_at >= ? AND
+created_at < ?) keeps idx_invoices_created and the rollup primary keys usable,
+where DATE(created_at) = ... or strftime(...) forces a full scan.
+
+created_at is written by SQLite's CURRENT_TIMESTAMP, so all ranges are UTC.
+A date string sorts before every timestamp on the same day, so the same
+bounds work for both sale_date and created_at columns.
+"""
+
+from datetime import datetime, date, timedelta, timezone
+
+DATE_FORMAT = '%Y-%m-%d'
+
+def utc_today():
+    """Current date in UTC (the timezone of created_at)"""
+    return datetime.now(timezone.utc).date()
+
+def as_date(value):
+    """Parse a 'YYYY-MM-DD' string (dates pass through unchanged)"""
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+def to_bounds(start, end):
+    """Format a [start, end) pair of dates as query parameters"""
+    return (start.strftime(DATE_FORMAT), end.strftime(DATE_FORMAT))
+
+def add_months(day, months):
+    """First day of the month `months` after the month containing day"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def day_range(day):
+    """The single day containing day"""
+    day = as_date(day)
+    return to_bounds(day, day + timedelta(days=1))
+
+def last_days_range(days, today=None):
+    """From midnight `days` days ago up to the end of today"""
+    today = today or utc_today()
+    return to_bounds(today - timedelta(days=days), today + timedelta(days=1))
+
+def month_range(day):
+    """The calendar month containing day"""
+    start = as_date(day).replace(day=1)
+    return to_bounds(start, add_months(start, 1))
+
+def year_range(day):
+    """The calendar year containing day"""
+    day = as_date(day)
+    return to_bounds(date(day.year, 1, 1), date(day.year + 1, 1, 1))
+
+def period_range(period, today=None):
+    """Bounds for a named reporting period, or None for all time"""
+    today = today or utc_today()
+    if period == 'today':
+        return day_range(today)
+    if period == 'yesterday':
+        return day_range(today - timedelta(days=1))
+    if period == 'week':
+        return last_days_range(7, today)
+    if period == 'month':
+        return month_range(today)
+    if period == 'year':
+        return year_range(today)
+    return None
@@ -0,0 +1,212 @@
+"""
+Sales Rollups
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+Aggregate tables maintained inside the same transaction as the invoice
+writes that change them, so analytics read a handful of rollup rows instead
+of rescanning invoices. Every rollup can be rebuilt from scratch with
+`flask --app app rebuild-rollups`.
+
+Customer totals (total_orders, total_spent, last_order_at on customers)
+and the item-level rollups (category_daily_sales, product_daily_sales) are
+kept the same way and leave out cancelled invoices.
+"""
+
+def record_invoice(conn, invoice_id, items_sold):
+    """Add a newly written invoice to the rollups"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO daily_sales (sale_date, payment_method, payment_status, invoice_count, revenue, items_sold)
+        SELECT DATE(created_at), payment_method, payment_status, 1, total_amount, ?
+        FROM invoices WHERE id = ?
+        ON CONFLICT(sale_date, payment_method, payment_status) DO UPDATE SET
+            invoice_count = invoice_count + excluded.invoice_count,
+            revenue = revenue + excluded.revenue,
+            items_sold = items_sold + excluded.items_sold
+    """, (items_sold, invoice_id))
+    cursor.execute("""
+        UPDATE customers SET
+            total_orders = total_orders + 1,
+            total_spent = total_spent + (SELECT total_amount FROM invoices WHERE id = :id),
+            last_order_at = MAX(COALESCE(last_order_at, ''), (SELECT created_at FROM invoices WHERE id = :id))
+        WHERE id = (SELECT customer_id FROM invoices WHERE id = :id AND payment_status != 'cancelled')
+    """, {'id': invoice_id})
+    
+    cursor.execute("SELECT payment_status FROM invoices WHERE id = ?", (invoice_id,))
+    row = cursor.fetchone()
+    if row is not None and row['payment_status'] != 'cancelled':
+        add_item_sales(cursor, invoice_id, 1)
+    cursor.close()
+
+def add_item_sales(cursor, invoice_id, sign):
+    """Add (sign=1) or remove (sign=-1) an invoice's lines in the item-level rollups"""
+    # Lines count under the category stored with them at sale time, so moving
+    # a product later never shifts its past sales (or what a cancellation
+    # takes back); uncategorized products roll up under category 0
+    cursor.execute("""
+        INSERT INTO category_daily_sales (sale_date, category_id, quantity, revenue, line_count)
+        SELECT DATE(i.created_at), COALESCE(ii.category_id, 0),
+               :sign * SUM(ii.quantity), :sign * SUM(ii.total_price), :sign * COUNT(*)
+        FROM invoice_items ii
+        JOIN invoices i ON i.id = ii.invoice_id
+        WHERE ii.invoice_id = :id
+        GROUP BY 1, 2
+        ON CONFLICT(sale_date, category_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue,
+            line_count = line_count + excluded.line_count
+    """, {'id': invoice_id, 'sign': sign})
+    # unit_price_sum / line_count is the average selling price
+    cursor.execute("""
+        INSERT INTO product_daily_sales (sale_date, product_id, quantity, revenue, unit_price_sum, line_count)
+        SELECT DATE(i.created_at), ii.product_id,
+               :sign * SUM(ii.quantity), :sign * SUM(ii.total_price),
+               :sign * SUM(ii.unit_price), :sign * COUNT(*)
+        FROM invoice_items ii
+        JOIN invoices i ON i.id = ii.invoice_id
+        WHERE ii.invoice_id = :id AND ii.product_id IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT(sale_date, product_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue,
+            unit_price_sum = unit_price_sum + excluded.unit_price_sum,
+            line_count = line_count + excluded.line_count
+    """, {'id': invoice_id, 'sign': sign})
+    if sign < 0:
+        # Drop rows emptied by a cancellation, as a rebuild would
+        for table in ('category_daily_sales', 'product_daily_sales'):
+            cursor.execute(f"""
+                DELETE FROM {table}
+                WHERE sale_date = (SELECT DATE(created_at) FROM invoices WHERE id = ?) AND line_count = 0
+            """, (invoice_id,))
+
+def move_invoice_status(conn, invoice_id, old_status, new_status):
+    """Move an invoice between payment-status buckets (call after updating it)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DATE(i.created_at) as sale_date, i.payment_method, i.total_amount,
+               COALESCE((SELECT SUM(quantity) FROM invoice_items WHERE invoice_id = i.id), 0) as items_sold
+        FROM invoices i WHERE i.id = ?
+    """, (invoice_id,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.close()
+        return
+
+    cursor.executemany("""
+        INSERT INTO daily_sales (sale_date, payment_method, payment_status, invoice_count, revenue, items_sold)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(sale_date, payment_method, payment_status) DO UPDATE SET
+            invoice_count = invoice_count + excluded.invoice_count,
+            revenue = revenue + excluded.revenue,
+            items_sold = items_sold + excluded.items_sold
+    """, [
+        (row['sale_date'], row['payment_method'], old_status, -1, -row['total_amount'], -row['items_sold']),
+        (row['sale_date'], row['payment_method'], new_status, 1, row['total_amount'], row['items_sold'])
+    ])
+    
+    # Cancelling (or reinstating) an invoice changes its customer's totals;
+    # recount them from the customer's few invoices
+    if (old_status == 'cancelled') != (new_status == 'cancelled'):
+        cursor.execute(f"""
+            UPDATE customers SET {CUSTOMER_TOTALS}
+            WHERE id = (SELECT customer_id FROM invoices WHERE id = ?)
+        """, (invoice_id,))
+        add_item_sales(cursor, invoice_id, -1 if new_status == 'cancelled' else 1)
+    cursor.close()
+
+def rebuild_daily_sales(cursor):
+    """Recompute daily_sales from invoices"""
+    cursor.execute("DELETE FROM daily_sales")
+    cursor.execute("""
+        INSERT INTO daily_sales (sale_date, payment_method, payment_status, invoice_count, revenue, items_sold)
+        SELECT DATE(i.created_at), i.payment_method, i.payment_status,
+               COUNT(*), COALESCE(SUM(i.total_amount), 0), COALESCE(SUM(ii.items_sold), 0)
+        FROM invoices i
+        LEFT JOIN (
+            SELECT invoice_id, SUM(quantity) as items_sold FROM invoice_items GROUP BY invoice_id
+        ) ii ON ii.invoice_id = i.id
+        GROUP BY DATE(i.created_at), i.payment_method, i.payment_status
+    """)
+
+# Assignments recomputing a customer's totals (each reads
+# idx_invoices_customer_created for that customer only)
+CUSTOMER_TOTALS = """
+    total_orders = (SELECT COUNT(*) FROM invoices
+                    WHERE customer_id = customers.id AND payment_status != 'cancelled'),
+    total_spent = (SELECT COALESCE(SUM(total_amount), 0) FROM invoices
+                   WHERE customer_id = customers.id AND payment_status != 'cancelled'),
+    last_order_at = (SELECT MAX(created_at) FROM invoices
+                     WHERE customer_id = customers.id AND payment_status != 'cancelled')
+"""
+
+def rebuild_customer_totals(cursor):
+    """Recompute every customer's totals from invoices"""
+    cursor.execute(f"UPDATE customers SET {CUSTOMER_TOTALS}")
+
+def rebuild_category_daily_sales(cursor):
+    """Recompute category_daily_sales from invoice items"""
+    # Before migration 15 (i.e. when migration 13 first fills the table)
+    # lines have no category of their own; use their product's current one
+    cursor.execute("SELECT 1 FROM pragma_table_info('invoice_items') WHERE name = 'category_id'")
+    has_line_category = cursor.fetchone() is not None
+    category, join = ('ii.category_id', '') if has_line_category else \
+        ('p.category_id', 'LEFT JOIN products p ON p.id = ii.product_id')
+    
+    cursor.execute("DELETE FROM category_daily_sales")
+    cursor.execute(f"""
+        INSERT INTO category_daily_sales (sale_date, category_id, quantity, revenue, line_count)
+        SELECT DATE(i.created_at), COALESCE({category}, 0),
+               SUM(ii.quantity), SUM(ii.total_price), COUNT(*)
+        FROM invoice_items ii
+        JOIN invoices i ON i.id = ii.invoice_id
+        {join}
+        WHERE i.payment_status != 'cancelled'
+        GROUP BY 1, 2
+    """)
+
+def rebuild_product_daily_sales(cursor):
+    """Recompute product_daily_sales from invoice items"""
+    cursor.execute("DELETE FROM product_daily_sales")
+    cursor.execute("""
+        INSERT INTO product_daily_sales (sale_date, product_id, quantity, revenue, unit_price_sum, line_count)
+        SELECT DATE(i.created_at), ii.product_id,
+               SUM(ii.quantity), SUM(ii.total_price), SUM(ii.unit_price), COUNT(*)
+        FROM invoice_items ii
+        JOIN invoices i ON i.id = ii.invoice_id
+        WHERE i.payment_status != 'cancelled' AND ii.product_id IS NOT NULL
+        GROUP BY 1, 2
+    """)
+
+# Every rollup and its rebuild step, in dependency order
+ROLLUPS = [
+    ('daily_sales', rebuild_daily_sales),
+    ('customer_totals', rebuild_customer_totals),
+    ('category_daily_sales', rebuild_category_daily_sales),
+    ('product_daily_sales', rebuild_product_daily_sales),
+]
+
+def rebuild_rollups(conn, names=None):
+    """Rebuild every rollup (or only those named) in one transaction and return their names"""
+    if names:
+        unknown = set(names) - {name for name, _ in ROLLUPS}
+        if unknown:
+            raise ValueError(f"Unknown rollup: {', '.join(sorted(unknown))}")
+    selected = [(name, rebuild) for name, rebuild in ROLLUPS if not names or name in names]
+    
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            for _, rebuild in selected:
+                rebuild(cursor)
+            cursor.close()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = previous_isolation
+    return [name for name, _ in selected]
@@ -0,0 +1,24 @@
+"""
+Search Helpers
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+Product and customer search go through FTS5 tables (see migrations 9 and
+10) that match word prefixes through their prefix indexes instead of
+scanning with LIKE '%x%'.
+"""
+
+import re
+
+SEARCH_TOKEN = re.compile(r'\w+')
+
+def fts_query(search):
+    """FTS5 query matching every word of search as a prefix, or None"""
+    tokens = SEARCH_TOKEN.findall(search)
+    if not tokens:
+        return None
+    # Quoting keeps words like AND/NOT/NEAR from being read as operators
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def prefix_range(prefix):
+    """(low, high) bounds such that low <= value < high selects values starting with prefix"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
@@ -0,0 +1,88 @@
+"""
+Time-Series Bucketing
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+Builds chart series with a single GROUP BY query: rows are grouped into
+calendar buckets (hour, day, ISO week starting Monday, or month) inside a
+half-open date range, and buckets with no rows are filled in Python.
+"""
+
+from datetime import datetime, timedelta, timezone
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.periods import add_months, DATE_FORMAT
+
+HOUR_FORMAT = '%Y-%m-%d %H:00:00'
+MAX_BUCKETS = 3660
+
+# SQL expression giving the label of the bucket a timestamp/date column falls in
+BUCKET_SQL = {
+    'hour': "strftime('%Y-%m-%d %H:00:00', {column})",
+    'day': "DATE({column})",
+    'week': "DATE({column}, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', {column})",
+}
+
+GRANULARITIES = tuple(BUCKET_SQL)
+
+def bucket_starts(granularity, count, now=None):
+    """Start of each of the last `count` buckets, oldest first, ending with the current one"""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    count = min(count, MAX_BUCKETS)
+
+    if granularity == 'hour':
+        current = now.replace(minute=0, second=0, microsecond=0)
+        return [current - timedelta(hours=i) for i in range(count - 1, -1, -1)]
+
+    today = now.date()
+    if granularity == 'day':
+        return [today - timedelta(days=i) for i in range(count - 1, -1, -1)]
+    if granularity == 'week':
+        monday = today - timedelta(days=today.weekday())
+        return [monday - timedelta(weeks=i) for i in range(count - 1, -1, -1)]
+    if granularity == 'month':
+        return [add_months(today, -i) for i in range(count - 1, -1, -1)]
+    raise ValueError(f'Invalid granularity: {granularity}')
+
+def next_bucket(granularity, start):
+    """Start of the bucket following start"""
+    if granularity == 'hour':
+        return start + timedelta(hours=1)
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(weeks=1)
+    return add_months(start, 1)
+
+def bucket_label(granularity, start):
+    """Label matching BUCKET_SQL for a bucket start"""
+    return start.strftime(HOUR_FORMAT if granularity == 'hour' else DATE_FORMAT)
+
+def time_series(cursor, table, column, granularity, count, metrics, now=None):
+    """Aggregate table into the last `count` buckets with one grouped query.
+
+    metrics maps output names to SQL aggregate expressions. Returns a list of
+    (bucket_start, {name: value}) pairs oldest first; empty buckets get 0.
+    """
+    starts = bucket_starts(granularity, count, now)
+    if not starts:
+        return []
+    start = bucket_label(granularity, starts[0])
+    end = bucket_label(granularity, next_bucket(granularity, starts[-1]))
+
+    select = ', '.join(f"{expression} as {name}" for name, expression in metrics.items())
+    cursor.execute(f"""
+        SELECT {BUCKET_SQL[granularity].format(column=column)} as bucket, {select}
+        FROM {table}
+        WHERE {column} >= ? AND {column} < ?
+        GROUP BY bucket
+    """, (start, end))
+    rows = {row['bucket']: row for row in cursor.fetchall()}
+
+    series = []
+    for bucket_start in starts:
+        row = rows.get(bucket_label(granularity, bucket_start))
+        series.append((bucket_start, {name: (row[name] or 0) if row else 0 for name in metrics}))
+    return series
@@ -0,0 +1,176 @@
+"""
+Group-Commit Writer
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+A single background thread owns a write connection and applies write jobs
+submitted by request threads. Jobs that arrive together are coalesced into
+one transaction (one fsync), each inside its own savepoint so a failing job
+does not affect the others in its batch.
+
+A job the submitter gave up on before the writer reached it is dropped, not
+run late; once a job has started, its submitter waits for the outcome, so a
+request never reports a failure for a write that then commits.
+"""
+
+import queue
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import open_connection
+
+# Batching limits
+GROUP_COMMIT_MAX_BATCH = 64
+# Seconds the batch leader waits for followers. With 0, jobs that queue up
+# while a batch is committing form the next batch (natural batching).
+GROUP_COMMIT_MAX_WAIT = float(os.environ.get('GROUP_COMMIT_MAX_WAIT', 0))
+SUBMIT_TIMEOUT = 30
+
+class _WriteJob:
+    __slots__ = ('fn', 'args', 'result', 'error', 'done', 'state')
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.state = 'queued'  # -> 'started' or 'abandoned', under the writer lock
+
+class GroupCommitWriter:
+    """Dedicated writer thread with group commit"""
+
+    def __init__(self, factory, max_batch=GROUP_COMMIT_MAX_BATCH, max_wait=GROUP_COMMIT_MAX_WAIT):
+        self._factory = factory
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._jobs = 0
+        self._batches = 0
+        self._failed = 0
+        self._largest_batch = 0
+        self._abandoned = 0
+
+    def _ensure_started(self):
+        # Start lazily, and again in each forked worker process
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, timeout=SUBMIT_TIMEOUT):
+        """Run fn(conn, *args) in the writer's next transaction and return its result"""
+        self._ensure_started()
+        job = _WriteJob(fn, args)
+        self._queue.put(job)
+        if not job.done.wait(timeout):
+            with self._lock:
+                abandoned = job.state == 'queued'
+                if abandoned:
+                    job.state = 'abandoned'
+                    self._abandoned += 1
+            if abandoned:
+                raise TimeoutError('Timed out waiting for database writer')
+            # Already running: its transaction decides the outcome
+            job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _run(self):
+        conn = None
+        jobs = self._queue
+
+        while True:
+            batch = [jobs.get()]
+            deadline = time.monotonic() + self._max_wait
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(jobs.get(timeout=remaining))
+                    else:
+                        batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            if conn is None:
+                try:
+                    conn = self._factory()
+                    conn.isolation_level = None  # Transactions are managed explicitly
+                except Exception as e:
+                    conn = None
+                    self._fail_batch(batch, e)
+                    continue
+            self._commit_batch(conn, batch)
+
+    def _fail_batch(self, batch, error):
+        for job in batch:
+            job.error = error
+        self._finish_batch(batch)
+
+    def _claim(self, batch):
+        """Mark jobs started, leaving out the ones their submitters abandoned"""
+        with self._lock:
+            claimed = [job for job in batch if job.state == 'queued']
+            for job in claimed:
+                job.state = 'started'
+        return claimed
+
+    def _commit_batch(self, conn, batch):
+        batch = self._claim(batch)
+        if not batch:
+            return
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    job.result = job.fn(conn, *job.args)
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    job.error = e
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for job in batch:
+                if job.error is None:
+                    job.result = None
+                    job.error = e
+        finally:
+            self._finish_batch(batch)
+
+    def _finish_batch(self, batch):
+        with self._lock:
+            self._batches += 1
+            self._jobs += len(batch)
+            self._failed += sum(1 for job in batch if job.error is not None)
+            self._largest_batch = max(self._largest_batch, len(batch))
+        for job in batch:
+            job.done.set()
+
+    def stats(self):
+        """Return writer counters"""
+        with self._lock:
+            return {
+                'jobs': self._jobs,
+                'batches': self._batches,
+                'failed': self._failed,
+                'largest_batch': self._largest_batch,
+                'abandoned': self._abandoned,
+                'queued': self._queue.qsize() if self._queue else 0
+            }
+
+writer = GroupCommitWriter(open_connection)
@@ -3,16 +3,35 @@ Analytics API Routes
 BillMaster Pro - Python/Flask Backend (SQLite)
 """
 
-from flask import Blueprint, request, jsonify, session
-from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, session, current_app
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.database import get_connection, dict_from_row, dict_list_from_rows
+from config.database import get_read_db, read_generations, dict_from_row, dict_list_from_rows
+from config.periods import period_range, last_days_range
+from config.timeseries import time_series, bucket_label, GRANULARITIES
+from config.cache import ResponseCache
 
 analytics_bp = Blueprint('analytics', __name__)
 
+# Seconds a cached response may be served; writes invalidate sooner
+ANALYTICS_TTLS = {
+    'dashboard': 10,
+    'hourly_sales': 10,
+    'recent_invoices': 10,
+    'low_stock': 30,
+    'summary': 30,
+    'sales_chart': 60,
+    'payment_methods': 60,
+    'top_products': 60,
+    'customer_stats': 60,
+    'monthly': 300,
+}
+
+ANALYTICS_TABLES = ('customers', 'invoices', 'products')
+analytics_cache = ResponseCache(ANALYTICS_TABLES, ANALYTICS_TTLS)
+
 @analytics_bp.route('/analytics.php', methods=['GET', 'OPTIONS'])
 def analytics_handler():
     """Handle analytics requests - maintains PHP-style URL for frontend compatibility"""
@@ -21,6 +40,22 @@ def analytics_handler():
     
     action = request.args.get('action', '')
     
+    key = analytics_cache.make_key(action, request.args)
+    body = analytics_cache.get(key)
+    if body is not None:
+        response = current_app.response_class(body, mimetype='application/json')
+        response.headers['X-Cache'] = 'HIT'
+        return response
+    
+    generation = read_generations(ANALYTICS_TABLES)
+    response = dispatch_action(action)
+    if response.status_code == 200 and (response.get_json(silent=True) or {}).get('success'):
+        analytics_cache.put(key, generation, response.get_data())
+    response.headers['X-Cache'] = 'MISS'
+    return response
+
+def dispatch_action(action):
+    """Run the handler for an analytics action"""
     if action == 'dashboard':
         return dashboard_stats()
     elif action == 'sales_chart':
@@ -47,42 +82,47 @@ def analytics_handler():
 def dashboard_stats():
     """Get dashboard statistics"""
     try:
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         
+        today_range = period_range('today')
+        yesterday_range = period_range('yesterday')
+        this_month_range = period_range('month')
+        
         # Today's stats
         cursor.execute("""
             SELECT 
-                COUNT(*) as invoices,
-                COALESCE(SUM(total_amount), 0) as revenue,
-                COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN total_amount ELSE 0 END), 0) as paid_revenue,
-                COALESCE(SUM(CASE WHEN payment_status = 'pending' THEN total_amount ELSE 0 END), 0) as pending_revenue
-            FROM invoices 
-            WHERE DATE(created_at) = DATE('now')
-        """)
-        today = dict_from_row(cursor.fetchone()) or {'invoices': 0, 'revenue': 0, 'paid_revenue': 0, 'pending_revenue': 0}
+                COALESCE(SUM(invoice_count), 0) as invoices,
+                COALESCE(SUM(revenue), 0) as revenue,
+                COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN revenue ELSE 0 END), 0) as paid_revenue,
+                COALESCE(SUM(CASE WHEN payment_status = 'pending' THEN revenue ELSE 0 END), 0) as pending_revenue,
+                COALESCE(SUM(items_sold), 0) as items_sold
+            FROM daily_sales 
+            WHERE sale_date >= ? AND sale_date < ?
+        """, today_range)
+        today = dict_from_row(cursor.fetchone()) or {'invoices': 0, 'revenue': 0, 'paid_revenue': 0, 'pending_revenue': 0, 'items_sold': 0}
         
         # Yesterday's stats
         cursor.execute("""
             SELECT 
-                COUNT(*) as invoices,
-                COALESCE(SUM(total_amount), 0) as revenue
-            FROM invoices 
-            WHERE DATE(created_at) = DATE('now', '-1 day')
-        """)
+                COALESCE(SUM(invoice_count), 0) as invoices,
+                COALESCE(SUM(revenue), 0) as revenue
+            FROM daily_sales 
+            WHERE sale_date >= ? AND sale_date < ?
+        """, yesterday_range)
         yesterday = dict_from_row(cursor.fetchone()) or {'invoices': 0, 'revenue': 0}
         
         # This month's stats
         cursor.execute("""
             SELECT 
-                COUNT(*) as invoices,
-                COALESCE(SUM(total_amount), 0) as revenue
-            FROM invoices 
-            WHERE strftime('%Y-%m', created_at) = strftime('%Y-%m', 'now')
-        """)
+                COALESCE(SUM(invoice_count), 0) as invoices,
+                COALESCE(SUM(revenue), 0) as revenue
+            FROM daily_sales 
+            WHERE sale_date >= ? AND sale_date < ?
+        """, this_month_range)
         month = dict_from_row(cursor.fetchone()) or {'invoices': 0, 'revenue': 0}
         
         # Products count
@@ -93,17 +133,7 @@ def dashboard_stats():
         cursor.execute("SELECT COUNT(*) as cnt FROM customers")
         customers = dict_from_row(cursor.fetchone())['cnt']
         
-        # Items sold today
-        cursor.execute("""
-            SELECT COALESCE(SUM(ii.quantity), 0) as items_sold
-            FROM invoice_items ii
-            JOIN invoices i ON ii.invoice_id = i.id
-            WHERE DATE(i.created_at) = DATE('now')
-        """)
-        items_sold = dict_from_row(cursor.fetchone())['items_sold']
-        
         cursor.close()
-        conn.close()
         
         # Calculate growth percentage
         revenue_growth = 0
@@ -118,7 +148,7 @@ def dashboard_stats():
                     'revenue': float(today['revenue']),
                     'paid_revenue': float(today['paid_revenue']),
                     'pending_revenue': float(today['pending_revenue']),
-                    'items_sold': int(items_sold)
+                    'items_sold': int(today['items_sold'])
                 },
                 'yesterday': {
                     'invoices': int(yesterday['invoices']),
@@ -137,38 +167,46 @@ def dashboard_stats():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+# Series metrics per source: daily rollup for day/week/month, invoices for hours
+ROLLUP_SERIES = {
+    'total': "COALESCE(SUM(revenue), 0)",
+    'count': "COALESCE(SUM(invoice_count), 0)",
+    'paid': "COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN revenue ELSE 0 END), 0)"
+}
+INVOICE_SERIES = {
+    'total': "COALESCE(SUM(total_amount), 0)",
+    'count': "COUNT(*)",
+    'paid': "COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN total_amount ELSE 0 END), 0)"
+}
+
 def sales_chart():
-    """Get sales data for chart"""
+    """Get sales data for chart (granularity: day, week, month or hour)"""
     try:
-        days = request.args.get('days', 7, type=int)
+        granularity = request.args.get('granularity', 'day')
+        periods = request.args.get('periods', type=int)
+        if periods is None:
+            periods = request.args.get('days', 7, type=int)
         
-        conn = get_connection()
+        if granularity not in GRANULARITIES:
+            return jsonify({'success': False, 'message': 'Invalid granularity'})
+        
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
-        data = []
-        
-        for i in range(days - 1, -1, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(total_amount), 0) as total,
-                    COUNT(*) as count,
-                    COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN total_amount ELSE 0 END), 0) as paid
-                FROM invoices 
-                WHERE DATE(created_at) = ?
-            """, (date,))
-            row = dict_from_row(cursor.fetchone()) or {'total': 0, 'count': 0, 'paid': 0}
-            data.append({
-                'date': date,
-                'total': float(row['total']),
-                'count': int(row['count']),
-                'paid': float(row['paid'])
-            })
-        
+        if granularity == 'hour':
+            series = time_series(cursor, 'invoices', 'created_at', granularity, periods, INVOICE_SERIES)
+        else:
+            series = time_series(cursor, 'daily_sales', 'sale_date', granularity, periods, ROLLUP_SERIES)
         cursor.close()
-        conn.close()
+        
+        data = [{
+            'date': bucket_label(granularity, start),
+            'total': float(row['total']),
+            'count': int(row['count']),
+            'paid': float(row['paid'])
+        } for start, row in series]
         
         return jsonify({'success': True, 'data': data})
         
@@ -178,7 +216,7 @@ def sales_chart():
 def payment_methods():
     """Get payment methods breakdown"""
     try:
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -186,13 +224,14 @@ def payment_methods():
         cursor.execute("""
             SELECT 
                 payment_method, 
-                SUM(total_amount) as total, 
-                COUNT(*) as count
-            FROM invoices
-            WHERE created_at >= DATE('now', '-30 days')
+                SUM(revenue) as total, 
+                SUM(invoice_count) as count
+            FROM daily_sales
+            WHERE sale_date >= ? AND sale_date < ?
             GROUP BY payment_method
+            HAVING count > 0
             ORDER BY total DESC
-        """)
+        """, last_days_range(30))
         rows = dict_list_from_rows(cursor.fetchall())
         
         # Calculate percentage
@@ -205,7 +244,6 @@ def payment_methods():
             data.append(row)
         
         cursor.close()
-        conn.close()
         
         if not data:
             data = [{'payment_method': 'cash', 'total': 0, 'count': 0, 'percentage': 0}]
@@ -221,30 +259,29 @@ def top_products():
         limit = request.args.get('limit', 5, type=int)
         days = request.args.get('days', 30, type=int)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
+        # One rollup row per product per day, whatever the item volume
         cursor.execute("""
             SELECT 
                 p.id,
                 p.name, 
                 p.price as unit_price,
-                SUM(ii.quantity) as sold, 
-                SUM(ii.total_price) as revenue,
-                ROUND(AVG(ii.unit_price), 2) as avg_price
-            FROM invoice_items ii
-            JOIN products p ON ii.product_id = p.id
-            JOIN invoices i ON ii.invoice_id = i.id
-            WHERE i.created_at >= DATE('now', ? || ' days')
-            GROUP BY p.id, p.name, p.price
+                SUM(s.quantity) as sold, 
+                SUM(s.revenue) as revenue,
+                ROUND(SUM(s.unit_price_sum) / SUM(s.line_count), 2) as avg_price
+            FROM product_daily_sales s
+            JOIN products p ON s.product_id = p.id
+            WHERE s.sale_date >= ? AND s.sale_date < ?
+            GROUP BY s.product_id
             ORDER BY revenue DESC
             LIMIT ?
-        """, (f'-{days}', limit))
+        """, (*last_days_range(days), limit))
         data = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         # Convert types
         for row in data:
@@ -263,7 +300,7 @@ def low_stock():
     try:
         threshold = request.args.get('threshold', 10, type=int)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -277,7 +314,6 @@ def low_stock():
         """, (threshold,))
         data = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         # Convert types
         for row in data:
@@ -292,7 +328,7 @@ def low_stock():
 def hourly_sales():
     """Get hourly sales breakdown for today"""
     try:
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -303,13 +339,12 @@ def hourly_sales():
                 COUNT(*) as invoices,
                 COALESCE(SUM(total_amount), 0) as revenue
             FROM invoices 
-            WHERE DATE(created_at) = DATE('now')
+            WHERE created_at >= ? AND created_at < ?
             GROUP BY hour
             ORDER BY hour ASC
-        """)
+        """, period_range('today'))
         result = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         # Initialize all hours with 0
         hourly_data = {i: {'hour': i, 'invoices': 0, 'revenue': 0} for i in range(24)}
@@ -333,7 +368,7 @@ def recent_invoices():
     try:
         limit = request.args.get('limit', 10, type=int)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -354,7 +389,6 @@ def recent_invoices():
         """, (limit,))
         data = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         # Convert types
         for row in data:
@@ -370,35 +404,21 @@ def monthly_stats():
     try:
         months = request.args.get('months', 6, type=int)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
-        data = []
-        
-        for i in range(months - 1, -1, -1):
-            date = datetime.now() - timedelta(days=i*30)
-            month = date.strftime('%Y-%m')
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as invoices,
-                    COALESCE(SUM(total_amount), 0) as revenue,
-                    COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN total_amount ELSE 0 END), 0) as paid
-                FROM invoices 
-                WHERE strftime('%Y-%m', created_at) = ?
-            """, (month,))
-            row = dict_from_row(cursor.fetchone()) or {'invoices': 0, 'revenue': 0, 'paid': 0}
-            data.append({
-                'month': month,
-                'month_name': date.strftime('%b %Y'),
-                'invoices': int(row['invoices']),
-                'revenue': float(row['revenue']),
-                'paid': float(row['paid'])
-            })
-        
+        series = time_series(cursor, 'daily_sales', 'sale_date', 'month', months, ROLLUP_SERIES)
         cursor.close()
-        conn.close()
+        
+        data = [{
+            'month': start.strftime('%Y-%m'),
+            'month_name': start.strftime('%b %Y'),
+            'invoices': int(row['count']),
+            'revenue': float(row['total']),
+            'paid': float(row['paid'])
+        } for start, row in series]
         
         return jsonify({'success': True, 'data': data})
         
@@ -410,29 +430,21 @@ def customer_stats():
     try:
         limit = request.args.get('limit', 5, type=int)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
+        # Walks idx_customers_spent from the top; totals are kept by the rollups
         cursor.execute("""
-            SELECT 
-                c.id,
-                c.name,
-                c.phone,
-                COUNT(i.id) as total_orders,
-                COALESCE(SUM(i.total_amount), 0) as total_spent,
-                MAX(i.created_at) as last_order
-            FROM customers c
-            LEFT JOIN invoices i ON c.id = i.customer_id
-            GROUP BY c.id, c.name, c.phone
-            HAVING total_orders > 0
+            SELECT id, name, phone, total_orders, total_spent, last_order_at as last_order
+            FROM customers
+            WHERE total_orders > 0
             ORDER BY total_spent DESC
             LIMIT ?
         """, (limit,))
         data = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         # Convert objects
         for row in data:
@@ -449,19 +461,10 @@ def summary():
     try:
         period = request.args.get('period', 'today')
         
-        # Build date filter
-        if period == 'today':
-            date_filter = "DATE(created_at) = DATE('now')"
-        elif period == 'week':
-            date_filter = "created_at >= DATE('now', '-7 days')"
-        elif period == 'month':
-            date_filter = "strftime('%Y-%m', created_at) = strftime('%Y-%m', 'now')"
-        elif period == 'year':
-            date_filter = "strftime('%Y', created_at) = strftime('%Y', 'now')"
-        else:
-            date_filter = "1=1"
+        # Half-open [start, end) range of the reporting period
+        bounds = period_range(period)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -469,41 +472,41 @@ def summary():
         
         cursor.execute(f"""
             SELECT 
-                COUNT(*) as total_invoices,
-                COALESCE(SUM(total_amount), 0) as total_revenue,
-                COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN total_amount ELSE 0 END), 0) as paid_amount,
-                COALESCE(SUM(CASE WHEN payment_status = 'pending' THEN total_amount ELSE 0 END), 0) as pending_amount,
-                COALESCE(AVG(total_amount), 0) as avg_order_value,
-                COUNT(DISTINCT customer_id) as unique_customers
-            FROM invoices 
-            WHERE {date_filter}
-        """)
+                COALESCE(SUM(invoice_count), 0) as total_invoices,
+                COALESCE(SUM(revenue), 0) as total_revenue,
+                COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN revenue ELSE 0 END), 0) as paid_amount,
+                COALESCE(SUM(CASE WHEN payment_status = 'pending' THEN revenue ELSE 0 END), 0) as pending_amount,
+                COALESCE(SUM(items_sold), 0) as items_sold
+            FROM daily_sales 
+            WHERE {"sale_date >= ? AND sale_date < ?" if bounds else "1=1"}
+        """, bounds or ())
         summary_data = dict_from_row(cursor.fetchone()) or {}
         
-        # Items sold
+        # Distinct customers cannot be rolled up; count them from invoices
         cursor.execute(f"""
-            SELECT COALESCE(SUM(ii.quantity), 0) as items_sold
-            FROM invoice_items ii
-            JOIN invoices i ON ii.invoice_id = i.id
-            WHERE {date_filter}
-        """)
-        items_result = dict_from_row(cursor.fetchone())
-        items_sold = items_result['items_sold'] if items_result else 0
+            SELECT COUNT(DISTINCT customer_id) as unique_customers
+            FROM invoices 
+            WHERE {"created_at >= ? AND created_at < ?" if bounds else "1=1"}
+        """, bounds or ())
+        customers_result = dict_from_row(cursor.fetchone())
+        unique_customers = customers_result['unique_customers'] if customers_result else 0
         
         cursor.close()
-        conn.close()
+        
+        total_invoices = int(summary_data.get('total_invoices', 0))
+        total_revenue = float(summary_data.get('total_revenue', 0))
         
         return jsonify({
             'success': True,
             'data': {
                 'period': period,
-                'total_invoices': int(summary_data.get('total_invoices', 0)),
-                'total_revenue': float(summary_data.get('total_revenue', 0)),
+                'total_invoices': total_invoices,
+                'total_revenue': total_revenue,
                 'paid_amount': float(summary_data.get('paid_amount', 0)),
                 'pending_amount': float(summary_data.get('pending_amount', 0)),
-                'avg_order_value': float(summary_data.get('avg_order_value', 0)),
-                'unique_customers': int(summary_data.get('unique_customers', 0)),
-                'items_sold': int(items_sold)
+                'avg_order_value': total_revenue / total_invoices if total_invoices else 0.0,
+                'unique_customers': int(unique_customers),
+                'items_sold': int(summary_data.get('items_sold', 0))
             }
         })
         
@@ -10,7 +10,8 @@ import os
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.database import get_connection, dict_from_row
+from config.database import get_db, get_read_db, dict_from_row
+from config.generations import generations
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -43,7 +44,7 @@ def login():
         if not username or not password:
             return jsonify({'success': False, 'message': 'Username and password required'})
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -52,7 +53,6 @@ def login():
         row = cursor.fetchone()
         user = dict_from_row(row) if row else None
         cursor.close()
-        conn.close()
         
         if user:
             # Check password
@@ -118,7 +118,7 @@ def register():
         if not username or not password or not full_name:
             return jsonify({'success': False, 'message': 'Required fields missing'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -128,7 +128,6 @@ def register():
         cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
         if cursor.fetchone():
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Username already exists'})
         
         # Create user
@@ -139,8 +138,8 @@ def register():
         """, (username, hashed_password, full_name, email, role))
         
         conn.commit()
+        generations.bump('users')
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'User created'})
         
@@ -0,0 +1,119 @@
+"""
+Batch API Routes
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+POST /api/batch runs several read-only sub-requests in one round trip:
+
+    {"requests": [{"endpoint": "analytics.php", "action": "dashboard", "params": {}}, ...]}
+
+Each sub-request is dispatched to the existing blueprint handler as a GET
+request. They share the request's pooled read connection inside a single
+read transaction, so every result comes from the same database snapshot.
+Caches filled from it (analytics, the product catalog, settings) are tagged
+with the generations taken before that transaction began, never with ones
+that moved while the batch ran (see read_generations()).
+"""
+
+from flask import Blueprint, request, jsonify, current_app, g
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import get_read_db
+from config.generations import generations, TABLES
+
+batch_bp = Blueprint('batch', __name__)
+
+MAX_BATCH_REQUESTS = 20
+
+# Actions that only read, per endpoint (None allows every action)
+BATCH_ACTIONS = {
+    'analytics.php': None,
+    'categories.php': {'list', 'get', 'sales'},
+    'customers.php': {'list', 'get'},
+    'invoices.php': {'list', 'get', 'today_summary'},
+    'products.php': {'list', 'get'},
+    'settings.php': {'get'},
+}
+
+@batch_bp.route('/batch', methods=['POST', 'OPTIONS'])
+def batch_handler():
+    """Run a list of read-only sub-requests against one snapshot"""
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    try:
+        data = request.get_json() or {}
+        subrequests = data.get('requests')
+
+        if not isinstance(subrequests, list) or not subrequests:
+            return jsonify({'success': False, 'message': 'No requests provided'})
+        if len(subrequests) > MAX_BATCH_REQUESTS:
+            return jsonify({'success': False, 'message': f'At most {MAX_BATCH_REQUESTS} requests per batch'})
+
+        conn = get_read_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'})
+
+        started = time.perf_counter()
+        # The snapshot is at least this new; sub-requests share g with us
+        g.batch_generations = dict(zip(TABLES, generations.values(TABLES)))
+        conn.execute("BEGIN")
+        try:
+            results = [run_subrequest(sub) for sub in subrequests]
+        finally:
+            conn.rollback()
+            g.pop('batch_generations', None)
+
+        return jsonify({
+            'success': True,
+            'data': results,
+            'time_ms': round((time.perf_counter() - started) * 1000, 3)
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def run_subrequest(sub):
+    """Dispatch one sub-request to its blueprint handler and return its result"""
+    if not isinstance(sub, dict):
+        return {'status': 400, 'result': {'success': False, 'message': 'Invalid request'}, 'time_ms': 0}
+
+    endpoint = sub.get('endpoint', '')
+    action = sub.get('action', '')
+    params = sub.get('params') or {}
+    entry = {'endpoint': endpoint, 'action': action}
+    if 'id' in sub:
+        entry['id'] = sub['id']
+
+    if endpoint not in BATCH_ACTIONS or not isinstance(params, dict):
+        return {**entry, 'status': 400, 'result': {'success': False, 'message': 'Invalid endpoint'}, 'time_ms': 0}
+    allowed = BATCH_ACTIONS[endpoint]
+    if allowed is not None and action not in allowed:
+        return {**entry, 'status': 400, 'result': {'success': False, 'message': 'Action not allowed in batch'}, 'time_ms': 0}
+
+    query = {key: value for key, value in params.items() if key != 'action'}
+    query['action'] = action
+
+    started = time.perf_counter()
+    # The nested request context reuses the current app context, so handlers
+    # calling get_read_db() get the connection (and snapshot) opened above
+    with current_app.test_request_context(
+        f'/api/{endpoint}',
+        method='GET',
+        query_string=query,
+        headers={'Cookie': request.headers.get('Cookie', '')}
+    ):
+        try:
+            response = current_app.make_response(current_app.dispatch_request())
+            status, result = response.status_code, response.get_json(silent=True)
+        except Exception as e:
+            status, result = 500, {'success': False, 'message': str(e)}
+
+    return {
+        **entry,
+        'status': status,
+        'result': result,
+        'time_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
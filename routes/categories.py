@@ -6,9 +6,13 @@ BillMaster Pro - Python/Flask Backend (SQLite)
 from flask import Blueprint, request, jsonify, session
 import sys
 import os
+from datetime import timedelta
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.database import get_connection, dict_from_row, dict_list_from_rows
+from config.database import get_db, get_read_db, dict_from_row, dict_list_from_rows
+from config.generations import generations
+from config.cache import conditional
+from config.periods import period_range, last_days_range, as_date, DATE_FORMAT
 
 categories_bp = Blueprint('categories', __name__)
 
@@ -27,6 +31,8 @@ def categories_handler():
         return list_categories()
     elif action == 'get':
         return get_category()
+    elif action == 'sales':
+        return category_sales()
     elif action == 'create':
         return create_category()
     elif action == 'update':
@@ -36,36 +42,32 @@ def categories_handler():
     else:
         return jsonify({'success': False, 'message': 'Invalid action'})
 
+@conditional('categories', 'products')
 def list_categories():
     """List all categories with product count"""
     try:
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
+        # product_count is kept current by triggers on products
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT c.*, COUNT(p.id) as product_count 
-            FROM categories c 
-            LEFT JOIN products p ON c.id = p.category_id AND p.is_active = 1
-            GROUP BY c.id 
-            ORDER BY c.name ASC
-        """)
+        cursor.execute("SELECT * FROM categories ORDER BY name ASC")
         categories = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'data': categories})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@conditional('categories', 'products')
 def get_category():
     """Get single category by ID"""
     try:
         cat_id = request.args.get('id', 0, type=int)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -74,7 +76,6 @@ def get_category():
         row = cursor.fetchone()
         category = dict_from_row(row) if row else None
         cursor.close()
-        conn.close()
         
         if category:
             return jsonify({'success': True, 'data': category})
@@ -84,6 +85,79 @@ def get_category():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+def sales_range(args):
+    """Half-open date bounds from period, or inclusive date_from/date_to (default: last 30 days)"""
+    if args.get('period'):
+        bounds = period_range(args['period'])
+        if bounds is None:
+            raise ValueError('Invalid period')
+        return bounds
+    
+    start, end = last_days_range(30)
+    try:
+        if args.get('date_from'):
+            start = as_date(args['date_from']).strftime(DATE_FORMAT)
+        if args.get('date_to'):
+            end = (as_date(args['date_to']) + timedelta(days=1)).strftime(DATE_FORMAT)
+    except ValueError:
+        raise ValueError('Invalid date (use YYYY-MM-DD)')
+    return start, end
+
+def category_sales():
+    """Quantity and revenue per category over a date range.
+
+    Reads the category_daily_sales rollup, so the cost depends on the number
+    of days and categories, not on how many items were sold. With group=day
+    the per-day rows are returned as well.
+    """
+    try:
+        try:
+            start, end = sales_range(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
+        
+        conn = get_read_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'})
+        
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.category_id, c.name as category_name,
+                   SUM(s.quantity) as quantity, SUM(s.revenue) as revenue, SUM(s.line_count) as line_count
+            FROM category_daily_sales s
+            LEFT JOIN categories c ON c.id = s.category_id
+            WHERE s.sale_date >= ? AND s.sale_date < ?
+            GROUP BY s.category_id
+            ORDER BY revenue DESC
+        """, (start, end))
+        totals = dict_list_from_rows(cursor.fetchall())
+        
+        result = {
+            'date_from': start,
+            'date_to': (as_date(end) - timedelta(days=1)).strftime(DATE_FORMAT),
+            'categories': totals
+        }
+        
+        if request.args.get('group') == 'day':
+            cursor.execute("""
+                SELECT sale_date, category_id, quantity, revenue, line_count
+                FROM category_daily_sales
+                WHERE sale_date >= ? AND sale_date < ?
+                ORDER BY sale_date ASC, category_id ASC
+            """, (start, end))
+            result['days'] = dict_list_from_rows(cursor.fetchall())
+        cursor.close()
+        
+        for row in totals:
+            row['revenue'] = round(float(row['revenue']), 2)
+            if row['category_id'] == 0:
+                row['category_name'] = 'Uncategorized'
+        
+        return jsonify({'success': True, 'data': result})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 def create_category():
     """Create new category"""
     if not is_logged_in():
@@ -97,16 +171,16 @@ def create_category():
         if not name:
             return jsonify({'success': False, 'message': 'Category name is required'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         cursor.execute("INSERT INTO categories (name, description) VALUES (?, ?)", (name, description))
         conn.commit()
+        generations.bump('categories')
         new_id = cursor.lastrowid
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Category created', 'id': new_id})
         
@@ -127,7 +201,7 @@ def update_category():
         if not cat_id or not name:
             return jsonify({'success': False, 'message': 'Valid ID and name required'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -135,8 +209,8 @@ def update_category():
         cursor.execute("UPDATE categories SET name = ?, description = ? WHERE id = ?", 
                       (name, description, cat_id))
         conn.commit()
+        generations.bump('categories')
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Category updated'})
         
@@ -151,25 +225,24 @@ def delete_category():
     try:
         cat_id = request.args.get('id', 0, type=int)
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         
         # Check if category has products
-        cursor.execute("SELECT COUNT(*) as cnt FROM products WHERE category_id = ? AND is_active = 1", (cat_id,))
+        cursor.execute("SELECT product_count FROM categories WHERE id = ?", (cat_id,))
         result = dict_from_row(cursor.fetchone())
         
-        if result and result['cnt'] > 0:
+        if result and result['product_count'] > 0:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Cannot delete: category has active products'})
         
         cursor.execute("DELETE FROM categories WHERE id = ?", (cat_id,))
         conn.commit()
+        generations.bump('categories')
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Category deleted'})
         
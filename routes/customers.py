@@ -3,15 +3,35 @@ Customers API Routes
 BillMaster Pro - Python/Flask Backend (SQLite)
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app, Response, stream_with_context
 import sys
 import os
+import re
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.database import get_connection, dict_from_row, dict_list_from_rows
+from config.database import get_db, get_read_db, dict_from_row, dict_list_from_rows, HAS_FTS5
+from config.generations import generations
+from config.pagination import page_limit, encode_cursor, decode_cursor, paginate
+from config.migrations import PHONE_DIGITS_SQL, PHONE_LOCAL_SQL
+from config.search import fts_query, prefix_range
 
 customers_bp = Blueprint('customers', __name__)
 
+# Rows fetched from SQLite per step of a streamed customer list
+STREAM_BATCH_SIZE = 500
+
+# Typeahead result count
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+# Broad prefixes ("a", "mail") match most customers; only the first this
+# many matches in rowid order (oldest customers) are ranked, so the cost
+# stays bounded
+SEARCH_CANDIDATES = 200
+# Input made only of digits and phone punctuation is matched against phones
+PHONE_INPUT = re.compile(r'^[\d\s()+.-]+$')
+# Columns returned by the typeahead
+SEARCH_COLUMNS = "c.id, c.name, c.phone, c.email, c.address, c.customer_type"
+
 def is_logged_in():
     return session.get('logged_in', False)
 
@@ -25,6 +45,8 @@ def customers_handler():
     
     if action == 'list':
         return list_customers()
+    elif action == 'search':
+        return search_customers()
     elif action == 'get':
         return get_customer()
     elif action == 'create':
@@ -37,42 +59,163 @@ def customers_handler():
         return jsonify({'success': False, 'message': 'Invalid action'})
 
 def list_customers():
-    """List all customers with order stats"""
+    """List customers by name with their stored order totals.
+
+    With limit or cursor a page is returned with next_cursor. Without them
+    (the full list) or with stream=1 the response is streamed row by row
+    from the database cursor, so memory stays flat however many customers
+    there are.
+    """
     try:
         search = request.args.get('search', '')
+        paged = bool(request.args.get('limit') or request.args.get('cursor'))
+        stream = request.args.get('stream', '') in ('1', 'true') or not paged
         
-        conn = get_connection()
+        try:
+            limit = page_limit(request.args.get('limit')) if paged else None
+            after = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
+        
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
-        cursor = conn.cursor()
-        
+        where, params = [], []
         if search:
             search_param = f'%{search}%'
-            cursor.execute("""
-                SELECT c.*, 
-                       COUNT(DISTINCT i.id) as total_orders,
-                       COALESCE(SUM(i.total_amount), 0) as total_spent
-                FROM customers c
-                LEFT JOIN invoices i ON c.id = i.customer_id
-                WHERE c.name LIKE ? OR c.phone LIKE ? OR c.email LIKE ?
-                GROUP BY c.id 
-                ORDER BY c.name ASC
-            """, (search_param, search_param, search_param))
+            where.append("(c.name LIKE ? OR c.phone LIKE ? OR c.email LIKE ?)")
+            params.extend([search_param, search_param, search_param])
+        if after:
+            where.append("(c.name, c.id) > (?, ?)")
+            params.extend(after)
+        
+        # Order stats are stored on customers (see config/rollups.py)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT c.*
+            FROM customers c
+            WHERE {' AND '.join(where) or '1=1'}
+            ORDER BY c.name ASC, c.id ASC
+            {'LIMIT ?' if limit else ''}
+        """, (*params, limit + 1) if limit else params)
+        
+        if stream:
+            return Response(
+                stream_with_context(stream_customers(cursor, limit)),
+                mimetype='application/json'
+            )
+        
+        customers, next_cursor = paginate(
+            dict_list_from_rows(cursor.fetchall()), limit,
+            lambda customer: (customer['name'], customer['id'])
+        )
+        cursor.close()
+        
+        return jsonify({'success': True, 'data': customers, 'next_cursor': next_cursor})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def stream_customers(cursor, limit):
+    """Yield a list_customers JSON body, fetching STREAM_BATCH_SIZE rows at a time"""
+    dumps = current_app.json.dumps
+    yield '{"success": true, "data": ['
+    
+    count = 0
+    last = None
+    more = False
+    try:
+        while not more:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                # The query fetched one row past the page to detect more
+                if limit is not None and count == limit:
+                    more = True
+                    break
+                yield (',' if count else '') + dumps(dict(row))
+                count += 1
+                last = row
+    finally:
+        cursor.close()
+    
+    next_cursor = encode_cursor(last['name'], last['id']) if more else None
+    yield '], "next_cursor": ' + dumps(next_cursor) + '}'
+
+def search_customers():
+    """Typeahead: the best few customers matching q, without order stats.
+
+    Phone-like input is a prefix range on idx_customers_phone_digits, which
+    ignores separators on both sides ("98765 4" finds "98765-43210"), and on
+    idx_customers_phone_local, which also skips a stored country code
+    ("98765" finds "+91 98765-43210"). Anything else is a prefix match on
+    the words of name and email through customers_fts. A prefix matching
+    more than SEARCH_CANDIDATES customers is only ranked among the oldest
+    of them, so a newer, better match can be missed until more is typed.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        try:
+            limit = page_limit(request.args.get('limit'), SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid limit'})
+        
+        if not query:
+            return jsonify({'success': True, 'data': []})
+        
+        conn = get_read_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'})
+        
+        cursor = conn.cursor()
+        digits = re.sub(r'\D', '', query)
+        match = fts_query(query) if HAS_FTS5 else None
+        
+        if digits and PHONE_INPUT.match(query):
+            # Each index yields its first few matches in order; a phone
+            # found by both counts once, and national-number matches come
+            # before ones that only match through the country code
+            bounds = prefix_range(digits)
+            cursor.execute(f"""
+                SELECT {SEARCH_COLUMNS} FROM customers c
+                WHERE c.id IN (
+                    SELECT id FROM (
+                        SELECT id FROM customers WHERE {PHONE_DIGITS_SQL} >= ? AND {PHONE_DIGITS_SQL} < ?
+                        ORDER BY {PHONE_DIGITS_SQL} LIMIT ?
+                    )
+                    UNION
+                    SELECT id FROM (
+                        SELECT id FROM customers WHERE {PHONE_LOCAL_SQL} >= ? AND {PHONE_LOCAL_SQL} < ?
+                        ORDER BY {PHONE_LOCAL_SQL} LIMIT ?
+                    )
+                )
+                ORDER BY ({PHONE_LOCAL_SQL} >= ? AND {PHONE_LOCAL_SQL} < ?) DESC, {PHONE_LOCAL_SQL} ASC, c.id ASC
+                LIMIT ?
+            """, (*bounds, limit, *bounds, limit, *bounds, limit))
+        elif match:
+            # Name matches outrank email matches
+            cursor.execute(f"""
+                SELECT {SEARCH_COLUMNS} FROM (
+                    SELECT rowid, bm25(customers_fts, 10.0, 1.0) as score
+                    FROM customers_fts WHERE customers_fts MATCH ? LIMIT ?
+                ) f
+                JOIN customers c ON c.id = f.rowid
+                ORDER BY f.score ASC, c.name ASC
+                LIMIT ?
+            """, (match, SEARCH_CANDIDATES, limit))
         else:
-            cursor.execute("""
-                SELECT c.*, 
-                       COUNT(DISTINCT i.id) as total_orders,
-                       COALESCE(SUM(i.total_amount), 0) as total_spent
-                FROM customers c
-                LEFT JOIN invoices i ON c.id = i.customer_id
-                GROUP BY c.id 
-                ORDER BY c.name ASC
-            """)
+            search_param = f'%{query}%'
+            cursor.execute(f"""
+                SELECT {SEARCH_COLUMNS} FROM customers c
+                WHERE c.name LIKE ? OR c.phone LIKE ? OR c.email LIKE ?
+                ORDER BY c.name ASC, c.id ASC
+                LIMIT ?
+            """, (search_param, search_param, search_param, limit))
         
         customers = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'data': customers})
         
@@ -84,7 +227,7 @@ def get_customer():
     try:
         cust_id = request.args.get('id', 0, type=int)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -105,11 +248,9 @@ def get_customer():
             customer['invoices'] = invoices
             
             cursor.close()
-            conn.close()
             return jsonify({'success': True, 'data': customer})
         else:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Customer not found'})
             
     except Exception as e:
@@ -130,7 +271,7 @@ def create_customer():
         if not name:
             return jsonify({'success': False, 'message': 'Customer name is required'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -140,9 +281,9 @@ def create_customer():
             VALUES (?, ?, ?, ?)
         """, (name, phone, email, address))
         conn.commit()
+        generations.bump('customers')
         new_id = cursor.lastrowid
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Customer created', 'id': new_id})
         
@@ -161,7 +302,7 @@ def update_customer():
         if not cust_id:
             return jsonify({'success': False, 'message': 'Invalid customer ID'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -191,8 +332,8 @@ def update_customer():
         cursor = conn.cursor()
         cursor.execute(sql, params)
         conn.commit()
+        generations.bump('customers')
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Customer updated'})
         
@@ -207,15 +348,15 @@ def delete_customer():
     try:
         cust_id = request.args.get('id', 0, type=int)
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         cursor.execute("DELETE FROM customers WHERE id = ?", (cust_id,))
         conn.commit()
+        generations.bump('customers')
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Customer deleted'})
         
@@ -4,12 +4,22 @@ BillMaster Pro - Python/Flask Backend (SQLite)
 """
 
 from flask import Blueprint, request, jsonify, session
-from datetime import datetime
+from datetime import datetime, timedelta
+import sqlite3
+import math
+import statistics
+import time
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.database import get_connection, dict_from_row, dict_list_from_rows, generate_invoice_number
+from config.database import get_read_db, dict_from_row, dict_list_from_rows, reserve_invoice_numbers
+from config.writer import writer
+from config.rollups import record_invoice, move_invoice_status
+from config.periods import period_range, as_date, DATE_FORMAT
+from config.pagination import page_limit, decode_cursor, paginate
+from config.generations import generations
+from config.events import publish, publish_low_stock
 
 invoices_bp = Blueprint('invoices', __name__)
 
@@ -19,6 +29,24 @@ def is_logged_in():
 def get_current_user_id():
     return session.get('user_id', 1)
 
+# Stay well under SQLite's bound-parameter limit on older builds
+MAX_SQL_PARAMS = 900
+
+# Invoice list page size (the list used to return the latest 100)
+INVOICE_PAGE_SIZE = 100
+
+# Offline sync limits
+BULK_MAX_INVOICES = 1000
+BULK_CHUNK_SIZE = 50
+
+# UPDATE ... FROM needs SQLite 3.33+
+HAS_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33, 0)
+
+def chunked(values, size):
+    """Yield successive slices of values"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
 @invoices_bp.route('/invoices.php', methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 def invoices_handler():
     """Handle invoice requests - maintains PHP-style URL for frontend compatibility"""
@@ -33,6 +61,8 @@ def invoices_handler():
         return get_invoice()
     elif action == 'create':
         return create_invoice()
+    elif action == 'bulk_create':
+        return bulk_create()
     elif action == 'update_status':
         return update_status()
     elif action == 'today_summary':
@@ -41,49 +71,103 @@ def invoices_handler():
         return jsonify({'success': False, 'message': 'Invalid action'})
 
 def list_invoices():
-    """List all invoices with optional status filter"""
+    """List invoices newest first, filtered and paginated by (created_at, id) cursor"""
     try:
-        status = request.args.get('status', '')
+        try:
+            where, params = invoice_filters(request.args)
+            limit = page_limit(request.args.get('limit'), default=INVOICE_PAGE_SIZE)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT i.*, c.name as customer_name 
+            FROM invoices i 
+            LEFT JOIN customers c ON i.customer_id = c.id
+            WHERE {' AND '.join(where) or '1=1'}
+            ORDER BY i.created_at DESC, i.id DESC 
+            LIMIT ?
+        """, (*params, limit + 1))
         
-        if status:
-            cursor.execute("""
-                SELECT i.*, c.name as customer_name 
-                FROM invoices i 
-                LEFT JOIN customers c ON i.customer_id = c.id
-                WHERE i.payment_status = ?
-                ORDER BY i.created_at DESC 
-                LIMIT 100
-            """, (status,))
-        else:
-            cursor.execute("""
-                SELECT i.*, c.name as customer_name 
-                FROM invoices i 
-                LEFT JOIN customers c ON i.customer_id = c.id
-                ORDER BY i.created_at DESC 
-                LIMIT 100
-            """)
-        
-        invoices = dict_list_from_rows(cursor.fetchall())
+        invoices, next_cursor = paginate(
+            dict_list_from_rows(cursor.fetchall()), limit,
+            lambda invoice: (invoice['created_at'], invoice['id'])
+        )
         cursor.close()
-        conn.close()
         
-        return jsonify({'success': True, 'data': invoices})
+        return jsonify({'success': True, 'data': invoices, 'next_cursor': next_cursor})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+def invoice_filters(args):
+    """WHERE clauses and parameters for list filters (raises ValueError)"""
+    where, params = [], []
+    
+    # A customer's invoices are few: keep the planner on the customer index
+    # rather than the much larger status/method/cashier ones (unary + hides a
+    # column from index selection)
+    other = '+' if args.get('customer_id') else ''
+    
+    status = args.get('status', '')
+    if status:
+        if status not in PAYMENT_STATUSES:
+            raise ValueError('Invalid status')
+        where.append(f"{other}i.payment_status = ?")
+        params.append(status)
+    
+    payment_method = args.get('payment_method', '')
+    if payment_method:
+        if payment_method not in PAYMENT_METHODS:
+            raise ValueError(f'Invalid payment method: {payment_method}')
+        where.append(f"{other}i.payment_method = ?")
+        params.append(payment_method)
+    
+    for name, column in (('customer_id', 'i.customer_id'), ('user_id', f'{other}i.user_id')):
+        if args.get(name):
+            value = args.get(name, type=int)
+            if value is None:
+                raise ValueError(f'Invalid {name}')
+            where.append(f"{column} = ?")
+            params.append(value)
+    
+    # Inclusive calendar dates, applied as a half-open range on created_at
+    date_from, date_to = args.get('date_from', ''), args.get('date_to', '')
+    try:
+        if date_from:
+            where.append("i.created_at >= ?")
+            params.append(as_date(date_from).strftime(DATE_FORMAT))
+        if date_to:
+            where.append("i.created_at < ?")
+            params.append((as_date(date_to) + timedelta(days=1)).strftime(DATE_FORMAT))
+    except ValueError:
+        raise ValueError('Invalid date (use YYYY-MM-DD)')
+    
+    for name, operator in (('min_amount', '>='), ('max_amount', '<=')):
+        if args.get(name):
+            value = args.get(name, type=float)
+            if value is None:
+                raise ValueError(f'Invalid {name}')
+            where.append(f"i.total_amount {operator} ?")
+            params.append(value)
+    
+    if args.get('cursor'):
+        created_at, invoice_id = decode_cursor(args.get('cursor'), 2)
+        where.append("(i.created_at, i.id) < (?, ?)")
+        params.extend([created_at, invoice_id])
+    
+    return where, params
+
 def get_invoice():
     """Get single invoice with items"""
     try:
         inv_id = request.args.get('id', 0, type=int)
         
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -110,105 +194,282 @@ def get_invoice():
             invoice['items'] = items
             
             cursor.close()
-            conn.close()
             return jsonify({'success': True, 'data': invoice})
         else:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Invoice not found'})
             
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+PAYMENT_METHODS = ('cash', 'card', 'upi', 'bank_transfer', 'credit')
+PAYMENT_STATUSES = ('paid', 'pending', 'partial', 'cancelled')
+
+def build_invoice(data, user_id):
+    """Validate a client invoice payload and compute its totals (raises ValueError)"""
+    if not data or not isinstance(data, dict):
+        raise ValueError('Invalid data')
+    
+    items = data.get('items', [])
+    if not items or not isinstance(items, list):
+        raise ValueError('No items in cart')
+    
+    idempotency_key = data.get('idempotency_key') or None
+    if idempotency_key is not None and not isinstance(idempotency_key, str):
+        raise ValueError('Invalid idempotency key')
+    
+    payment_method = data.get('payment_method', 'cash')
+    payment_status = data.get('payment_status', 'paid')
+    if payment_method not in PAYMENT_METHODS:
+        raise ValueError(f'Invalid payment method: {payment_method}')
+    if payment_status not in PAYMENT_STATUSES:
+        raise ValueError(f'Invalid payment status: {payment_status}')
+    
+    try:
+        tax_rate = float(data.get('tax_rate', 0))
+        discount_amount = float(data.get('discount_amount', 0))
+        lines = [{
+            'product_id': int(item['product_id']),
+            'quantity': int(item['quantity']),
+            'unit_price': float(item['unit_price'])
+        } for item in items]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Invalid item data')
+    
+    # A negative line would put stock back and take sales out of the rollups
+    for line in lines:
+        if line['quantity'] <= 0:
+            raise ValueError('Item quantity must be positive')
+        if not math.isfinite(line['unit_price']) or line['unit_price'] < 0:
+            raise ValueError('Item price cannot be negative')
+    if not math.isfinite(tax_rate) or tax_rate < 0:
+        raise ValueError('Tax rate cannot be negative')
+    if not math.isfinite(discount_amount) or discount_amount < 0:
+        raise ValueError('Discount cannot be negative')
+    
+    customer_id = data.get('customer_id')
+    if customer_id is not None and (not isinstance(customer_id, int) or isinstance(customer_id, bool)):
+        raise ValueError('Invalid customer')
+    
+    # Calculate totals
+    subtotal = sum(line['quantity'] * line['unit_price'] for line in lines)
+    tax_amount = subtotal * (tax_rate / 100)
+    total_amount = subtotal + tax_amount - discount_amount
+    
+    return {
+        'customer_id': customer_id,
+        'user_id': user_id,
+        'subtotal': subtotal,
+        'tax_rate': tax_rate,
+        'tax_amount': tax_amount,
+        'discount_amount': discount_amount,
+        'total_amount': total_amount,
+        'payment_method': payment_method,
+        'payment_status': payment_status,
+        'idempotency_key': idempotency_key,
+        'items': lines
+    }
+
 def create_invoice():
     """Create new invoice with items"""
     if not is_logged_in():
         return jsonify({'success': False, 'message': 'Please login first'})
     
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'success': False, 'message': 'Invalid data'})
-        
-        customer_id = data.get('customer_id')
-        items = data.get('items', [])
-        tax_rate = float(data.get('tax_rate', 0))
-        discount_amount = float(data.get('discount_amount', 0))
-        payment_method = data.get('payment_method', 'cash')
-        payment_status = data.get('payment_status', 'paid')
+        try:
+            invoice = build_invoice(request.get_json(), get_current_user_id())
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
         
-        if not items:
-            return jsonify({'success': False, 'message': 'No items in cart'})
+        # Queue the write; concurrent checkouts share one transaction
+        result = writer.submit(write_invoices, [invoice])[0]
+        generations.bump('invoices', 'products', 'customers')
+        if result['status'] == 'error':
+            return jsonify({'success': False, 'message': result['message']})
+        if result['status'] == 'created':
+            publish_created_invoice(invoice, result)
         
-        # Calculate totals
-        subtotal = sum(float(item['quantity']) * float(item['unit_price']) for item in items)
-        tax_amount = subtotal * (tax_rate / 100)
-        total_amount = subtotal + tax_amount - discount_amount
+        return jsonify({
+            'success': True, 
+            'invoice_id': result['invoice_id'], 
+            'invoice_number': result['invoice_number']
+        })
         
-        conn = get_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def bulk_create():
+    """Create many invoices at once (offline terminal sync)"""
+    if not is_logged_in():
+        return jsonify({'success': False, 'message': 'Please login first'})
+    
+    try:
+        data = request.get_json() or {}
+        payloads = data.get('invoices') if isinstance(data, dict) else data
         
-        cursor = conn.cursor()
+        if not payloads or not isinstance(payloads, list):
+            return jsonify({'success': False, 'message': 'No invoices to create'})
+        if len(payloads) > BULK_MAX_INVOICES:
+            return jsonify({'success': False, 'message': f'At most {BULK_MAX_INVOICES} invoices per request'})
         
-        # Generate invoice number
-        invoice_number = generate_invoice_number(conn)
         user_id = get_current_user_id()
+        results = [None] * len(payloads)
+        pending = []
+        first_index = {}
         
-        try:
-            # Insert invoice
-            cursor.execute("""
-                INSERT INTO invoices (invoice_number, customer_id, user_id, subtotal, tax_rate, tax_amount, 
-                                     discount_amount, total_amount, payment_method, payment_status) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (invoice_number, customer_id, user_id, subtotal, tax_rate, tax_amount,
-                  discount_amount, total_amount, payment_method, payment_status))
+        for index, payload in enumerate(payloads):
+            try:
+                invoice = build_invoice(payload, user_id)
+            except ValueError as e:
+                results[index] = {'status': 'error', 'message': str(e)}
+                continue
             
-            invoice_id = cursor.lastrowid
-            
-            # Insert items and update stock
-            for item in items:
-                product_id = int(item['product_id'])
-                quantity = int(item['quantity'])
-                unit_price = float(item['unit_price'])
-                total_price = quantity * unit_price
-                
-                # Get product name
-                cursor.execute("SELECT name FROM products WHERE id = ?", (product_id,))
-                prod = cursor.fetchone()
-                product_name = prod['name'] if prod else 'Unknown'
-                
-                # Insert invoice item
-                cursor.execute("""
-                    INSERT INTO invoice_items (invoice_id, product_id, product_name, quantity, unit_price, total_price)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (invoice_id, product_id, product_name, quantity, unit_price, total_price))
-                
-                # Update stock
-                cursor.execute("""
-                    UPDATE products SET stock_quantity = MAX(0, stock_quantity - ?) WHERE id = ?
-                """, (quantity, product_id))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return jsonify({
-                'success': True, 
-                'invoice_id': invoice_id, 
-                'invoice_number': invoice_number
-            })
-            
-        except Exception as e:
-            conn.rollback()
-            cursor.close()
-            conn.close()
-            return jsonify({'success': False, 'message': str(e)})
+            # Repeated keys within one request resolve to the first occurrence
+            key = invoice['idempotency_key']
+            if key is not None and key in first_index:
+                continue
+            if key is not None:
+                first_index[key] = index
+            pending.append((index, invoice))
+        
+        # Each chunk is written in one transaction by the group-commit writer
+        for chunk in chunked(pending, BULK_CHUNK_SIZE):
+            try:
+                chunk_results = writer.submit(write_invoices, [invoice for _, invoice in chunk])
+            except Exception as e:
+                chunk_results = [{'status': 'error', 'message': str(e)} for _ in chunk]
+            generations.bump('invoices', 'products', 'customers')
+            for (index, _), result in zip(chunk, chunk_results):
+                results[index] = result
+        
+        for index, payload in enumerate(payloads):
+            if results[index] is None:
+                first = results[first_index[payload['idempotency_key']]]
+                results[index] = dict(first, status='duplicate') if first['status'] != 'error' else dict(first)
+        
+        for index, (payload, result) in enumerate(zip(payloads, results)):
+            result['index'] = index
+            result['idempotency_key'] = payload.get('idempotency_key') if isinstance(payload, dict) else None
+        
+        created = sum(1 for result in results if result['status'] == 'created')
+        if created:
+            # Too many to stream one by one; dashboards reload instead
+            publish('refresh', {'reason': 'bulk_create', 'created': created})
+        
+        return jsonify({
+            'success': True,
+            'created': created,
+            'duplicates': sum(1 for result in results if result['status'] == 'duplicate'),
+            'failed': sum(1 for result in results if result['status'] == 'error'),
+            'data': results
+        })
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+def write_invoices(conn, invoices):
+    """Write a batch of validated invoices (runs on the writer thread).
+
+    Invoices whose idempotency key already exists are reported as duplicates;
+    each remaining invoice is written in its own savepoint so one failure does
+    not undo the others. Returns one result dict per invoice.
+    """
+    cursor = conn.cursor()
+    results = [None] * len(invoices)
+    
+    # Resolve retries against keys already stored
+    keys = [invoice['idempotency_key'] for invoice in invoices if invoice['idempotency_key'] is not None]
+    existing = {}
+    for chunk in chunked(keys, MAX_SQL_PARAMS):
+        cursor.execute(f"""
+            SELECT id, invoice_number, idempotency_key FROM invoices 
+            WHERE idempotency_key IN ({', '.join('?' * len(chunk))})
+        """, chunk)
+        existing.update((row['idempotency_key'], row) for row in cursor.fetchall())
+    
+    new_indexes = []
+    for index, invoice in enumerate(invoices):
+        row = existing.get(invoice['idempotency_key'])
+        if row is not None:
+            results[index] = {'status': 'duplicate', 'invoice_id': row['id'], 'invoice_number': row['invoice_number']}
+        else:
+            new_indexes.append(index)
+    
+    # Reserve all invoice numbers with one sequence update
+    numbers = reserve_invoice_numbers(conn, len(new_indexes))
+    
+    for index, invoice_number in zip(new_indexes, numbers):
+        cursor.execute("SAVEPOINT invoice")
+        try:
+            invoice_id = write_invoice(conn, invoices[index], invoice_number)
+            cursor.execute("RELEASE invoice")
+            results[index] = {'status': 'created', 'invoice_id': invoice_id, 'invoice_number': invoice_number}
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO invoice")
+            cursor.execute("RELEASE invoice")
+            results[index] = {'status': 'error', 'message': str(e)}
+    
+    cursor.close()
+    return results
+
+def write_invoice(conn, invoice, invoice_number):
+    """Insert one invoice with its items and update stock, returning the new id"""
+    cursor = conn.cursor()
+    
+    # Insert invoice
+    cursor.execute("""
+        INSERT INTO invoices (invoice_number, customer_id, user_id, subtotal, tax_rate, tax_amount, 
+                             discount_amount, total_amount, payment_method, payment_status, idempotency_key) 
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (invoice_number, invoice['customer_id'], invoice['user_id'], invoice['subtotal'],
+          invoice['tax_rate'], invoice['tax_amount'], invoice['discount_amount'],
+          invoice['total_amount'], invoice['payment_method'], invoice['payment_status'],
+          invoice['idempotency_key']))
+    
+    invoice_id = cursor.lastrowid
+    
+    lines = [(item['product_id'], item['quantity'], item['unit_price'], item['quantity'] * item['unit_price'])
+             for item in invoice['items']]
+    
+    # Look up all product names and categories in one pass
+    product_ids = list({line[0] for line in lines})
+    products = {}
+    for chunk in chunked(product_ids, MAX_SQL_PARAMS):
+        cursor.execute(f"""
+            SELECT id, name, category_id FROM products WHERE id IN ({', '.join('?' * len(chunk))})
+        """, chunk)
+        products.update((row['id'], (row['name'], row['category_id'])) for row in cursor.fetchall())
+    
+    # Insert invoice items, keeping the category they were sold under
+    cursor.executemany("""
+        INSERT INTO invoice_items (invoice_id, product_id, product_name, category_id, quantity, unit_price, total_price)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(invoice_id, product_id, *products.get(product_id, ('Unknown', None)), quantity, unit_price, total_price)
+          for product_id, quantity, unit_price, total_price in lines])
+    
+    # Decrement stock once per distinct product
+    sold = {}
+    for product_id, quantity, _, _ in lines:
+        sold[product_id] = sold.get(product_id, 0) + quantity
+    if HAS_UPDATE_FROM:
+        for chunk in chunked(list(sold.items()), MAX_SQL_PARAMS // 2):
+            values = ', '.join('(?, ?)' for _ in chunk)
+            cursor.execute(f"""
+                WITH sold(product_id, quantity) AS (VALUES {values})
+                UPDATE products 
+                SET stock_quantity = MAX(0, stock_quantity - sold.quantity)
+                FROM sold WHERE products.id = sold.product_id
+            """, [value for pair in chunk for value in pair])
+    else:
+        cursor.executemany("UPDATE products SET stock_quantity = MAX(0, stock_quantity - ?) WHERE id = ?",
+                           [(quantity, product_id) for product_id, quantity in sold.items()])
+    
+    # Keep the sales rollups in the same transaction
+    record_invoice(conn, invoice_id, sum(line[1] for line in lines))
+    
+    cursor.close()
+    return invoice_id
+
 def update_status():
     """Update invoice payment status"""
     if not is_logged_in():
@@ -219,43 +480,98 @@ def update_status():
         inv_id = data.get('id', 0)
         status = data.get('status', '')
         
-        conn = get_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'})
+        if status not in PAYMENT_STATUSES:
+            return jsonify({'success': False, 'message': 'Invalid status'})
         
-        cursor = conn.cursor()
-        cursor.execute("UPDATE invoices SET payment_status = ? WHERE id = ?", (status, inv_id))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        previous = writer.submit(write_status, inv_id, status)
+        generations.bump('invoices', 'customers')
+        if previous is not None and previous != status:
+            publish('invoice_status', {'id': inv_id, 'previous_status': previous, 'payment_status': status})
         
         return jsonify({'success': True})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+def write_status(conn, inv_id, status):
+    """Change an invoice's payment status and move it between rollup buckets.
+
+    Returns the previous status, or None if the invoice does not exist.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT payment_status FROM invoices WHERE id = ?", (inv_id,))
+    row = cursor.fetchone()
+    
+    if row and row['payment_status'] != status:
+        cursor.execute("UPDATE invoices SET payment_status = ? WHERE id = ?", (status, inv_id))
+        move_invoice_status(conn, inv_id, row['payment_status'], status)
+    
+    cursor.close()
+    return row['payment_status'] if row else None
+
+def publish_created_invoice(invoice, result):
+    """Tell live dashboards about a committed invoice and any stock it ran low"""
+    publish('invoice', {
+        'id': result['invoice_id'],
+        'invoice_number': result['invoice_number'],
+        'total_amount': invoice['total_amount'],
+        'payment_method': invoice['payment_method'],
+        'payment_status': invoice['payment_status'],
+        'customer_id': invoice['customer_id'],
+        'items_sold': sum(line['quantity'] for line in invoice['items'])
+    })
+    
+    sold = {}
+    for line in invoice['items']:
+        sold[line['product_id']] = sold.get(line['product_id'], 0) + line['quantity']
+    conn = get_read_db()
+    if conn:
+        publish_low_stock(conn, sold)
+
 def today_summary():
     """Get today's invoice summary"""
     try:
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         cursor.execute("""
             SELECT 
-                COUNT(*) as total_invoices,
-                COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN total_amount ELSE 0 END), 0) as paid_amount,
-                COALESCE(SUM(total_amount), 0) as total_amount
-            FROM invoices 
-            WHERE DATE(created_at) = DATE('now')
-        """)
+                COALESCE(SUM(invoice_count), 0) as total_invoices,
+                COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN revenue ELSE 0 END), 0) as paid_amount,
+                COALESCE(SUM(revenue), 0) as total_amount
+            FROM daily_sales 
+            WHERE sale_date >= ? AND sale_date < ?
+        """, period_range('today'))
         row = cursor.fetchone()
         data = dict_from_row(row) if row else {'total_invoices': 0, 'paid_amount': 0, 'total_amount': 0}
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'data': data})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
+
+def benchmark_invoice_writes(conn, lines, runs=50):
+    """Time write_invoice() for carts of `lines` lines, each invoice in its
+    own committed transaction; returns the median milliseconds per invoice"""
+    product_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM products WHERE is_active = 1 ORDER BY id LIMIT ?", (lines,))]
+    if not product_ids:
+        raise ValueError('No active products to sell')
+    invoice = build_invoice({
+        'items': [{'product_id': product_ids[i % len(product_ids)], 'quantity': 1, 'unit_price': 1.0}
+                  for i in range(lines)]
+    }, None)
+    
+    conn.isolation_level = None
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        invoice_number, = reserve_invoice_numbers(conn, 1)
+        write_invoice(conn, invoice, invoice_number)
+        conn.execute("COMMIT")
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
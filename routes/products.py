@@ -6,12 +6,24 @@ BillMaster Pro - Python/Flask Backend (SQLite)
 from flask import Blueprint, request, jsonify, session
 import sys
 import os
+import re
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.database import get_connection, dict_from_row, dict_list_from_rows
+from config.database import get_db, get_read_db, dict_list_from_rows, HAS_FTS5
+from config.generations import generations
+from config.cache import conditional
+from config.events import publish_low_stock
+from config.search import fts_query
+from config.catalog import catalog
 
 products_bp = Blueprint('products', __name__)
 
+# Input that looks like a scanned code (no spaces, has a digit) is tried as
+# an exact barcode first
+BARCODE_PATTERN = re.compile(r'^(?=.*\d)[\w-]{4,}$')
+# bm25 weights for the name, description and barcode columns of products_fts
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0)
+
 def is_logged_in():
     return session.get('logged_in', False)
 
@@ -27,6 +39,12 @@ def products_handler():
         return list_products()
     elif action == 'get':
         return get_product()
+    elif action == 'scan':
+        return scan_product()
+    elif action == 'snapshot':
+        return catalog_snapshot()
+    elif action == 'changes':
+        return catalog_changes()
     elif action == 'create':
         return create_product()
     elif action == 'update':
@@ -38,6 +56,7 @@ def products_handler():
     else:
         return jsonify({'success': False, 'message': 'Invalid action'})
 
+@conditional('products', 'categories')
 def list_products():
     """List all products with optional filters"""
     try:
@@ -45,38 +64,70 @@ def list_products():
         search = request.args.get('search', '')
         active_only = request.args.get('active_only', 'true') != 'false'
         
-        conn = get_connection()
+        if not search.strip():
+            # Browsing (all products or one category) is served from memory
+            records = catalog.get().products(int(category_id) if category_id else None, active_only)
+            return jsonify({'success': True, 'data': [record.to_dict() for record in records]})
+        
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         
-        sql = """
-            SELECT p.*, c.name as category_name 
-            FROM products p 
-            LEFT JOIN categories c ON p.category_id = c.id 
-            WHERE 1=1
-        """
+        filters = ""
         params = []
         
         if active_only:
-            sql += " AND p.is_active = 1"
+            filters += " AND p.is_active = 1"
         
         if category_id:
-            sql += " AND p.category_id = ?"
+            filters += " AND p.category_id = ?"
             params.append(int(category_id))
         
-        if search:
-            sql += " AND (p.name LIKE ? OR p.barcode LIKE ?)"
-            search_param = f'%{search}%'
-            params.extend([search_param, search_param])
-        
-        sql += " ORDER BY p.name ASC"
+        search = search.strip()
+        products = None
+        
+        if search and BARCODE_PATTERN.match(search):
+            # Scanner fast path: one probe of idx_products_barcode
+            cursor.execute(f"""
+                SELECT p.*, c.name as category_name 
+                FROM products p 
+                LEFT JOIN categories c ON p.category_id = c.id 
+                WHERE p.barcode = ?{filters}
+                ORDER BY p.name ASC
+            """, [search] + params)
+            products = dict_list_from_rows(cursor.fetchall()) or None
+        
+        match = fts_query(search) if HAS_FTS5 else None
+        if products is None and match:
+            # Prefix match on every word, best matches first
+            cursor.execute(f"""
+                SELECT p.*, c.name as category_name 
+                FROM products_fts f 
+                JOIN products p ON p.id = f.rowid 
+                LEFT JOIN categories c ON p.category_id = c.id 
+                WHERE products_fts MATCH ?{filters}
+                ORDER BY bm25(products_fts, ?, ?, ?), p.name ASC
+            """, [match] + params + list(SEARCH_WEIGHTS))
+            products = dict_list_from_rows(cursor.fetchall())
+        
+        if products is None:
+            sql = f"""
+                SELECT p.*, c.name as category_name 
+                FROM products p 
+                LEFT JOIN categories c ON p.category_id = c.id 
+                WHERE 1=1{filters}
+            """
+            if search:
+                sql += " AND (p.name LIKE ? OR p.barcode LIKE ?)"
+                search_param = f'%{search}%'
+                params.extend([search_param, search_param])
+            sql += " ORDER BY p.name ASC"
+            cursor.execute(sql, params)
+            products = dict_list_from_rows(cursor.fetchall())
         
-        cursor.execute(sql, params)
-        products = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         # Convert is_active to boolean
         for prod in products:
@@ -88,34 +139,123 @@ def list_products():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@conditional('products', 'categories')
 def get_product():
     """Get single product by ID"""
     try:
         prod_id = request.args.get('id', 0, type=int)
         
-        conn = get_connection()
+        record = catalog.get().by_id.get(prod_id)
+        if record:
+            return jsonify({'success': True, 'data': record.to_dict()})
+        else:
+            return jsonify({'success': False, 'message': 'Product not found'})
+            
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def scan_product():
+    """Look up the active product with an exact barcode (POS scanner)"""
+    try:
+        barcode = request.args.get('barcode', '').strip()
+        if not barcode:
+            return jsonify({'success': False, 'message': 'Barcode is required'})
+        
+        record = catalog.get().scan(barcode)
+        if record:
+            return jsonify({'success': True, 'data': record.to_dict()})
+        else:
+            return jsonify({'success': False, 'message': 'Product not found'})
+            
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def compact_rows(cursor):
+    """Rows of the last query as {columns, rows} lists instead of dicts"""
+    return {
+        'columns': [column[0] for column in cursor.description],
+        'rows': [list(values) for values in cursor.fetchall()]
+    }
+
+def read_catalog_version(cursor):
+    cursor.execute("SELECT version FROM catalog_version WHERE id = 1")
+    return cursor.fetchone()[0]
+
+@conditional('products', 'categories')
+def catalog_snapshot():
+    """Active products and all categories in compact form, with the catalog version.
+
+    A terminal keeps the version and later asks for changes since it.
+    """
+    try:
+        conn = get_read_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'})
+        
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        # Read first: rows written meanwhile are returned again by the next
+        # changes call, never missed
+        version = read_catalog_version(cursor)
+        
+        cursor.execute("SELECT * FROM products WHERE is_active = 1 ORDER BY id")
+        products = compact_rows(cursor)
+        cursor.execute("SELECT * FROM categories ORDER BY id")
+        categories = compact_rows(cursor)
+        cursor.close()
+        
+        return jsonify({'success': True, 'data': {
+            'version': version,
+            'products': products,
+            'categories': categories
+        }})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@conditional('products', 'categories')
+def catalog_changes():
+    """Products and categories written after version `since`, in compact form.
+
+    Deactivated products come back as changed rows with is_active = 0;
+    deleted rows are listed by id under 'deleted'.
+    """
+    try:
+        since = request.args.get('since', type=int)
+        if since is None or since < 0:
+            return jsonify({'success': False, 'message': 'A valid since version is required'})
+        
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
+        cursor.row_factory = None
+        version = read_catalog_version(cursor)
+        if since > version:
+            cursor.close()
+            return jsonify({'success': False, 'message': 'Unknown catalog version, take a new snapshot'})
+        
+        cursor.execute("SELECT * FROM products WHERE row_version > ? ORDER BY row_version", (since,))
+        products = compact_rows(cursor)
+        cursor.execute("SELECT * FROM categories WHERE row_version > ? ORDER BY row_version", (since,))
+        categories = compact_rows(cursor)
         cursor.execute("""
-            SELECT p.*, c.name as category_name 
-            FROM products p 
-            LEFT JOIN categories c ON p.category_id = c.id 
-            WHERE p.id = ?
-        """, (prod_id,))
-        row = cursor.fetchone()
-        product = dict_from_row(row) if row else None
+            SELECT table_name, row_id FROM catalog_tombstones 
+            WHERE row_version > ? ORDER BY row_version
+        """, (since,))
+        deleted = {'products': [], 'categories': []}
+        for table_name, row_id in cursor.fetchall():
+            deleted[table_name].append(row_id)
         cursor.close()
-        conn.close()
         
-        if product:
-            if 'is_active' in product:
-                product['is_active'] = bool(product['is_active'])
-            return jsonify({'success': True, 'data': product})
-        else:
-            return jsonify({'success': False, 'message': 'Product not found'})
-            
+        return jsonify({'success': True, 'data': {
+            'version': version,
+            'products': products,
+            'categories': categories,
+            'deleted': deleted
+        }})
+        
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -139,7 +279,7 @@ def create_product():
         if not name or price <= 0:
             return jsonify({'success': False, 'message': 'Name and valid price are required'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -151,9 +291,9 @@ def create_product():
         """, (name, description, int(category_id) if category_id else None, price, stock_quantity, unit, barcode, is_active))
         
         conn.commit()
+        generations.bump('products')
         new_id = cursor.lastrowid
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Product created successfully', 'id': new_id})
         
@@ -172,7 +312,7 @@ def update_product():
         if not prod_id:
             return jsonify({'success': False, 'message': 'Invalid product ID'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -214,8 +354,8 @@ def update_product():
         cursor = conn.cursor()
         cursor.execute(sql, params)
         conn.commit()
+        generations.bump('products')
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Product updated successfully'})
         
@@ -233,15 +373,15 @@ def delete_product():
         if not prod_id:
             return jsonify({'success': False, 'message': 'Invalid product ID'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         cursor.execute("UPDATE products SET is_active = 0 WHERE id = ?", (prod_id,))
         conn.commit()
+        generations.bump('products')
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Product deleted successfully'})
         
@@ -262,12 +402,16 @@ def update_stock():
         if not prod_id:
             return jsonify({'success': False, 'message': 'Invalid product ID'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         
+        cursor.execute("SELECT stock_quantity FROM products WHERE id = ?", (prod_id,))
+        row = cursor.fetchone()
+        previous = row['stock_quantity'] if row else 0
+        
         if operation == 'add':
             cursor.execute("UPDATE products SET stock_quantity = stock_quantity + ? WHERE id = ?", 
                           (quantity, prod_id))
@@ -279,8 +423,17 @@ def update_stock():
                           (quantity, prod_id))
         
         conn.commit()
+        generations.bump('products')
         cursor.close()
-        conn.close()
+        
+        # Units removed, for the live dashboard's low-stock alert
+        if operation == 'add':
+            removed = -quantity
+        elif operation == 'subtract':
+            removed = min(quantity, previous)
+        else:
+            removed = previous - quantity
+        publish_low_stock(conn, {int(prod_id): removed})
         
         return jsonify({'success': True, 'message': 'Stock updated successfully'})
         
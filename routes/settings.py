@@ -8,7 +8,9 @@ import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.database import get_connection, dict_from_row, dict_list_from_rows
+from config.database import get_db, get_read_db, dict_from_row, dict_list_from_rows, settings_cache
+from config.generations import generations
+from config.cache import conditional
 
 settings_bp = Blueprint('settings', __name__)
 
@@ -37,20 +39,12 @@ def settings_handler():
     else:
         return jsonify({'success': False, 'message': 'Invalid action'})
 
+@conditional('settings')
 def get_settings():
     """Get all settings"""
     try:
-        conn = get_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'})
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT setting_key, setting_value FROM settings")
-        rows = dict_list_from_rows(cursor.fetchall())
-        settings = {row['setting_key']: row['setting_value'] for row in rows}
-        
-        cursor.close()
-        conn.close()
+        # Served from the in-process cache; the table is read only after a write
+        settings = settings_cache.get()
         
         return jsonify({'success': True, 'data': settings})
         
@@ -68,23 +62,23 @@ def update_settings():
         if not data or not isinstance(data, dict):
             return jsonify({'success': False, 'message': 'Invalid data'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         
-        for key, value in data.items():
-            # Check if setting exists
-            cursor.execute("SELECT id FROM settings WHERE setting_key = ?", (key,))
-            if cursor.fetchone():
-                cursor.execute("UPDATE settings SET setting_value = ? WHERE setting_key = ?", (value, key))
-            else:
-                cursor.execute("INSERT INTO settings (setting_key, setting_value) VALUES (?, ?)", (key, value))
+        # Upsert all keys in one batch
+        cursor.executemany("""
+            INSERT INTO settings (setting_key, setting_value) VALUES (?, ?)
+            ON CONFLICT(setting_key) DO UPDATE SET 
+                setting_value = excluded.setting_value,
+                updated_at = CURRENT_TIMESTAMP
+        """, list(data.items()))
         
         conn.commit()
         cursor.close()
-        conn.close()
+        settings_cache.invalidate()
         
         return jsonify({'success': True, 'message': 'Settings updated'})
         
@@ -97,7 +91,7 @@ def list_users():
         return jsonify({'success': False, 'message': 'Admin access required'})
     
     try:
-        conn = get_connection()
+        conn = get_read_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
@@ -105,7 +99,6 @@ def list_users():
         cursor.execute("SELECT id, username, full_name, email, role, created_at FROM users ORDER BY id ASC")
         users = dict_list_from_rows(cursor.fetchall())
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'data': users})
         
@@ -123,15 +116,15 @@ def delete_user():
         if user_id <= 1:
             return jsonify({'success': False, 'message': 'Cannot delete primary admin'})
         
-        conn = get_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'})
         
         cursor = conn.cursor()
         cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
         conn.commit()
+        generations.bump('users')
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'User deleted'})
         
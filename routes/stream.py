@@ -0,0 +1,129 @@
+"""
+Live Stream Routes
+BillMaster Pro - Python/Flask Backend (SQLite)
+
+GET /api/stream is a Server-Sent Events feed of the event bus for dashboards:
+
+    event: invoice         a new invoice was created
+    event: invoice_status  an invoice's payment status changed
+    event: low_stock       a product's stock fell to the low-stock threshold
+    event: refresh         something changed that was not (or could not be)
+                           replayed; reload everything
+
+Writes made in this process announce themselves with an event right after
+bumping their generations, so a bump from this process gets one poll for
+its event to arrive before it is turned into a 'refresh'. Bumps from other
+workers refresh on the poll that sees them.
+
+Each connection holds a worker thread, so concurrent streams per process
+are capped and every stream ends after STREAM_MAX_SECONDS; EventSource
+reconnects on its own and resumes from Last-Event-ID.
+"""
+
+from flask import Blueprint, request, jsonify, session, Response
+import threading
+import json
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.events import event_bus
+from config.generations import generations
+
+stream_bp = Blueprint('stream', __name__)
+
+HEARTBEAT_SECONDS = 15
+# How often to look for writes made by other worker processes
+POLL_SECONDS = 2
+STREAM_MAX_SECONDS = 600
+STREAM_MAX_CLIENTS = int(os.environ.get('STREAM_MAX_CLIENTS', 4))
+RETRY_MS = 3000
+
+# Writes to these tables that no event covers turn into 'refresh' events
+WATCHED_TABLES = ('customers', 'invoices', 'products')
+
+_slots = threading.BoundedSemaphore(STREAM_MAX_CLIENTS)
+
+def is_logged_in():
+    return session.get('logged_in', False)
+
+def format_event(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+def split_generations():
+    """Watched tables' bumps made by other processes and by this one"""
+    current, own = generations.snapshot(WATCHED_TABLES)
+    return tuple(value - mine for value, mine in zip(current, own)), own
+
+@stream_bp.route('/stream', methods=['GET'])
+def stream_handler():
+    """Stream live dashboard events"""
+    if not is_logged_in():
+        return jsonify({'success': False, 'message': 'Please login first'}), 401
+
+    if not _slots.acquire(blocking=False):
+        return jsonify({'success': False, 'message': 'Too many live connections'}), 503
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    def generate():
+        yield f'retry: {RETRY_MS}\n\n'
+
+        last_seq = event_bus.parse_id(last_event_id) if last_event_id else None
+        if last_seq is None:
+            last_seq = event_bus.last_seq()
+            if last_event_id:
+                # Resuming against another process (or after a restart)
+                yield format_event('refresh', {'reason': 'resume'}, event_bus.format_id(last_seq))
+
+        seen, seen_own = split_generations()
+        unannounced = False  # this process bumped with no event yet
+        started = last_beat = time.monotonic()
+
+        while time.monotonic() - started < STREAM_MAX_SECONDS:
+            events, missed = event_bus.wait(last_seq, POLL_SECONDS)
+
+            if missed:
+                last_seq = events[-1][0] if events else event_bus.last_seq()
+                yield format_event('refresh', {'reason': 'missed'}, event_bus.format_id(last_seq))
+            else:
+                for seq, event_type, data in events:
+                    yield format_event(event_type, data, event_bus.format_id(seq))
+                    last_seq = seq
+
+            others, own = split_generations()
+            changed = others != seen
+            if events:
+                seen_own, unannounced = own, False
+            elif own != seen_own:
+                # An event usually follows its bump; refresh if none came
+                if unannounced:
+                    changed = True
+                    seen_own, unannounced = own, False
+                else:
+                    unannounced = True
+            seen = others
+            if changed and not events:
+                yield format_event('refresh', {'reason': 'changed'})
+
+            now = time.monotonic()
+            if events or changed:
+                last_beat = now
+            elif now - last_beat >= HEARTBEAT_SECONDS:
+                yield ': heartbeat\n\n'
+                last_beat = now
+
+    # The generator needs no request context, so the request's pooled
+    # connections are returned as soon as this view returns
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Runs when the server closes the response, even if it never started
+    response.call_on_close(_slots.release)
+    return response
@@ -0,0 +1,46 @@
+"""
+Test fixtures: the app runs against a fresh database in a temporary directory
+(its migrations and seed data are applied when app.py is imported).
+"""
+
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import database
+
+# Must be set before app.py (and its migrate()) is imported
+database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix='billmaster-test-'), 'billmaster.db')
+
+from app import app as flask_app
+
+@pytest.fixture
+def app():
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    """Test client with a logged-in admin session"""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['logged_in'] = True
+        sess['user_id'] = 1
+    return client
+
+@pytest.fixture
+def conn():
+    """Standalone read-write connection to the test database"""
+    conn = database.open_connection()
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def create_invoice(client):
+    """POST an invoice through the API and return the new invoice's id"""
+    def create(items, **fields):
+        body = client.post('/api/invoices.php?action=create', json={'items': items, **fields}).get_json()
+        assert body['success'], body
+        return body['invoice_id']
+    return create
@@ -0,0 +1,60 @@
+"""
+Batched sub-requests read one snapshot; a write committed while a batch runs
+must not leave caches holding that snapshot's older data as current.
+"""
+
+import pytest
+
+from config.database import settings_cache
+from config.generations import generations
+from routes import batch
+
+BATCH = [
+    {'endpoint': 'analytics.php', 'action': 'low_stock'},
+    {'endpoint': 'products.php', 'action': 'get', 'params': {'id': 1}},
+    {'endpoint': 'settings.php', 'action': 'get'},
+]
+
+@pytest.fixture
+def write_during_batch(conn, monkeypatch):
+    """Commit a product price and business name change after the first sub-request"""
+    original = conn.execute("""
+        SELECT p.price, s.setting_value FROM products p, settings s
+        WHERE p.id = 1 AND s.setting_key = 'business_name'
+    """).fetchone()
+    run_subrequest = batch.run_subrequest
+    done = []
+
+    def run_then_write(sub):
+        result = run_subrequest(sub)
+        if not done:
+            conn.execute("UPDATE products SET price = 99.0 WHERE id = 1")
+            conn.execute("UPDATE settings SET setting_value = 'Renamed Store' WHERE setting_key = 'business_name'")
+            conn.commit()
+            generations.bump('products')
+            settings_cache.invalidate()
+            done.append(True)
+        return result
+
+    monkeypatch.setattr(batch, 'run_subrequest', run_then_write)
+    yield original
+    conn.execute("UPDATE products SET price = ? WHERE id = 1", (original[0],))
+    conn.execute("UPDATE settings SET setting_value = ? WHERE setting_key = 'business_name'", (original[1],))
+    conn.commit()
+    generations.bump('products')
+    settings_cache.invalidate()
+
+def test_write_during_batch_is_not_cached_as_current(client, write_during_batch):
+    price, business_name = write_during_batch
+    body = client.post('/api/batch', json={'requests': BATCH}).get_json()
+    assert body['success'], body
+    product, settings = body['data'][1]['result']['data'], body['data'][2]['result']['data']
+    # The batch itself answers from the snapshot taken before the write
+    assert (product['price'], settings['business_name']) == (price, business_name)
+
+    product = client.get('/api/products.php?action=get&id=1').get_json()['data']
+    listed = client.get('/api/products.php?action=list').get_json()['data']
+    settings = client.get('/api/settings.php?action=get').get_json()['data']
+    assert product['price'] == 99.0
+    assert next(row for row in listed if row['id'] == 1)['price'] == 99.0
+    assert settings['business_name'] == 'Renamed Store'
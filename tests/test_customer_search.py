@@ -0,0 +1,32 @@
+"""
+Phone typeahead ignores separators and a stored country code.
+"""
+
+import pytest
+
+@pytest.fixture
+def customers(client):
+    ids = {}
+    for name, phone in (('Asha Rao', '+91 98765-43210'), ('Ravi Kumar', '(987) 651-1111'),
+                        ('Dev Shah', '+91 60000-12345')):
+        body = client.post('/api/customers.php?action=create', json={'name': name, 'phone': phone}).get_json()
+        assert body['success'], body
+        ids[name] = body['id']
+    return ids
+
+def search(client, query):
+    body = client.get('/api/customers.php', query_string={'action': 'search', 'q': query}).get_json()
+    assert body['success'], body
+    return [customer['name'] for customer in body['data']]
+
+def test_phone_prefix_skips_country_code(client, customers):
+    assert 'Asha Rao' in search(client, '98765')
+    assert 'Asha Rao' in search(client, '98765 4')
+
+def test_phone_prefix_with_country_code(client, customers):
+    assert 'Asha Rao' in search(client, '+91 98765')
+
+def test_national_number_matches_come_first(client, customers):
+    # Dev's number only starts with 9 through its country code
+    results = search(client, '9')
+    assert results.index('Dev Shah') > max(results.index('Asha Rao'), results.index('Ravi Kumar'))
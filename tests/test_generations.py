@@ -0,0 +1,73 @@
+"""
+Table generations are shared between processes through the counter file:
+bumps from concurrent workers all land, and a write in one worker
+invalidates the caches of another.
+"""
+
+import multiprocessing
+import pytest
+
+from config import cache, database
+from config.cache import ResponseCache
+from config.database import SettingsCache
+from config.generations import TableGenerations
+
+fork = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                          reason='needs fork to share the patched generations')
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    """Generations backed by a fresh counter file, used by both caches"""
+    generations = TableGenerations(path=str(tmp_path / 'billmaster.db-gen'))
+    monkeypatch.setattr(cache, 'generations', generations)
+    monkeypatch.setattr(database, 'generations', generations)
+    return generations
+
+def run_processes(target, args_list):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=target, args=args) for args in args_list]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [process.exitcode for process in processes] == [0] * len(processes)
+
+def bump_many(generations, count):
+    for _ in range(count):
+        generations.bump('invoices', 'products')
+
+def write_setting(key, value):
+    conn = database.open_connection()
+    conn.execute("UPDATE settings SET setting_value = ? WHERE setting_key = ?", (value, key))
+    conn.commit()
+    conn.close()
+    database.settings_cache.invalidate()
+    cache.generations.bump('invoices')
+
+@fork
+def test_concurrent_bumps_are_not_lost(shared):
+    assert shared.stats()['shared']
+    before = shared.values(('invoices', 'products', 'customers'))
+    run_processes(bump_many, [(shared, 500)] * 8)
+    after = shared.values(('invoices', 'products', 'customers'))
+    assert [a - b for a, b in zip(after, before)] == [4000, 4000, 0]
+
+@fork
+def test_write_in_another_process_invalidates_caches(shared, conn):
+    responses = ResponseCache(('invoices',), {'dashboard': 60})
+    key = ('dashboard',)
+    responses.put(key, responses.generation(), b'{"success": true}')
+    settings = SettingsCache()
+    original = settings.get(conn)['business_name']
+    assert responses.get(key) is not None
+    assert settings.get(conn)['business_name'] == original
+    assert settings.stats()['hits'] == 1
+
+    run_processes(write_setting, [('business_name', 'Renamed Store')])
+    try:
+        assert responses.get(key) is None
+        assert settings.get(conn)['business_name'] == 'Renamed Store'
+        assert settings.stats()['misses'] == 2
+    finally:
+        conn.execute("UPDATE settings SET setting_value = ? WHERE setting_key = 'business_name'", (original,))
+        conn.commit()
@@ -0,0 +1,35 @@
+"""
+Invoice payload validation, for single checkouts and offline bulk sync.
+"""
+
+import pytest
+
+LINE = {'product_id': 1, 'quantity': 1, 'unit_price': 10.0}
+
+def stock(conn):
+    return conn.execute("SELECT stock_quantity FROM products WHERE id = 1").fetchone()[0]
+
+@pytest.mark.parametrize('payload', [
+    {'items': [dict(LINE, quantity=0)]},
+    {'items': [dict(LINE, quantity=-5)]},
+    {'items': [dict(LINE, unit_price=-1.0)]},
+    {'items': [dict(LINE, unit_price='nan')]},
+    {'items': [LINE], 'discount_amount': -20},
+    {'items': [LINE], 'tax_rate': -18},
+    {'items': [LINE], 'customer_id': '1'},
+    {'items': [LINE], 'customer_id': 1.5},
+])
+def test_bulk_rejects_invalid_invoice(client, conn, payload):
+    before = stock(conn)
+    body = client.post('/api/invoices.php?action=bulk_create', json={'invoices': [payload, {'items': [LINE]}]}).get_json()
+    assert body['success'], body
+    assert [result['status'] for result in body['data']] == ['error', 'created']
+    assert body['failed'] == 1
+    assert stock(conn) == before - 1
+
+def test_create_rejects_negative_quantity(client):
+    body = client.post('/api/invoices.php?action=create', json={'items': [dict(LINE, quantity=-1)]}).get_json()
+    assert body == {'success': False, 'message': 'Item quantity must be positive'}
+
+def test_customer_may_be_omitted(create_invoice):
+    assert create_invoice([LINE], customer_id=None)
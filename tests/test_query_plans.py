@@ -0,0 +1,78 @@
+"""
+Every statement behind the analytics actions and the invoice list must reach
+invoices through an index: EXPLAIN QUERY PLAN may never show a table scan.
+"""
+
+import re
+import pytest
+
+from config import database
+from routes.analytics import analytics_cache
+
+ANALYTICS_REQUESTS = [
+    'dashboard', 'sales_chart', 'sales_chart&days=90', 'payment_methods', 'top_products',
+    'top_products&days=7', 'low_stock', 'hourly_sales', 'recent_invoices', 'monthly',
+    'customer_stats', 'summary', 'summary&period=week', 'summary&period=month',
+]
+
+INVOICE_LIST_REQUESTS = [
+    '', 'status=paid', 'payment_method=card', 'customer_id=1', 'customer_id=1&status=paid',
+    'user_id=1', 'date_from=2024-01-01&date_to=2030-12-31', 'status=pending&date_from=2024-01-01',
+    'min_amount=10&max_amount=500', 'limit=1',
+]
+
+# A full pass over the invoices table, under its own name or an alias
+TABLE_SCAN = re.compile(r'SCAN (invoices|i)\b(?! USING)')
+
+@pytest.fixture
+def traced(monkeypatch):
+    """Statements run on read connections opened from now on"""
+    statements = []
+
+    def open_traced():
+        conn = database.open_read_connection()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(database, 'read_pool', database.ConnectionPool(open_traced))
+    analytics_cache.clear()
+    return statements
+
+@pytest.fixture(autouse=True)
+def invoices(create_invoice):
+    for method in ('cash', 'card', 'upi'):
+        create_invoice([{'product_id': 1, 'quantity': 2, 'unit_price': 10.0}], payment_method=method,
+                       customer_id=1)
+
+def table_scans(statements):
+    conn = database.open_read_connection()
+    try:
+        scans = {}
+        for sql in dict.fromkeys(statements):
+            if 'invoices' not in sql or not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            plan = [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+            if any(TABLE_SCAN.match(detail) for detail in plan):
+                scans[' '.join(sql.split())] = plan
+        return scans
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize('query', ANALYTICS_REQUESTS)
+def test_analytics_use_indexes(client, traced, query):
+    response = client.get(f'/api/analytics.php?action={query}')
+    assert response.get_json()['success']
+    assert traced
+    assert table_scans(traced) == {}
+
+@pytest.mark.parametrize('query', INVOICE_LIST_REQUESTS)
+def test_invoice_list_uses_indexes(client, traced, query):
+    response = client.get(f'/api/invoices.php?action=list&{query}')
+    assert response.get_json()['success']
+    assert table_scans(traced) == {}
+
+def test_invoice_list_next_page_uses_indexes(client, traced):
+    first = client.get('/api/invoices.php?action=list&limit=1').get_json()
+    assert first['next_cursor']
+    client.get(f"/api/invoices.php?action=list&limit=1&cursor={first['next_cursor']}")
+    assert table_scans(traced) == {}
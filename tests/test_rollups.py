@@ -0,0 +1,42 @@
+"""
+Item-level rollups follow the category an invoice line was sold under, even
+after its product moves to another category.
+"""
+
+from config.rollups import rebuild_rollups
+
+def category_sales(conn):
+    return {row['category_id']: (row['quantity'], row['line_count'])
+            for row in conn.execute("SELECT category_id, quantity, line_count FROM category_daily_sales")}
+
+def rebuilt_category_sales(conn):
+    rebuild_rollups(conn, ['category_daily_sales'])
+    return category_sales(conn)
+
+def test_cancel_after_product_moves_category(client, conn, create_invoice):
+    product_id, old_category = conn.execute("SELECT id, category_id FROM products WHERE is_active = 1").fetchone()
+    new_category = conn.execute("SELECT id FROM categories WHERE id != ?", (old_category,)).fetchone()[0]
+    before = category_sales(conn)
+
+    invoice_id = create_invoice([{'product_id': product_id, 'quantity': 3, 'unit_price': 5.0}])
+    sold = category_sales(conn)
+    assert sold[old_category][0] == before.get(old_category, (0, 0))[0] + 3
+
+    try:
+        conn.execute("UPDATE products SET category_id = ? WHERE id = ?", (new_category, product_id))
+        conn.commit()
+
+        body = client.post('/api/invoices.php?action=update_status',
+                           json={'id': invoice_id, 'status': 'cancelled'}).get_json()
+        assert body['success'], body
+        assert category_sales(conn) == before
+        assert rebuilt_category_sales(conn) == before
+    finally:
+        conn.execute("UPDATE products SET category_id = ? WHERE id = ?", (old_category, product_id))
+        conn.commit()
+
+def test_line_keeps_category_it_was_sold_under(conn, create_invoice):
+    product_id, category = conn.execute("SELECT id, category_id FROM products WHERE is_active = 1").fetchone()
+    invoice_id = create_invoice([{'product_id': product_id, 'quantity': 1, 'unit_price': 5.0}])
+    assert conn.execute("SELECT category_id FROM invoice_items WHERE invoice_id = ?",
+                        (invoice_id,)).fetchone()[0] == category
@@ -0,0 +1,53 @@
+"""
+The live stream turns table writes into events: a write announced on the
+event bus is sent once, as that event, and only unannounced writes become
+'refresh'.
+"""
+
+import threading
+import time
+import pytest
+
+from config.events import publish
+from config.generations import TableGenerations, generations
+from routes import stream
+
+@pytest.fixture
+def events(client, monkeypatch):
+    """Iterator over the stream's SSE chunks, past the initial retry line"""
+    monkeypatch.setattr(stream, 'POLL_SECONDS', 0.2)
+    response = client.get('/api/stream')
+    chunks = response.iter_encoded()
+    assert next(chunks).startswith(b'retry:')
+    yield chunks
+    response.close()
+
+def event_type(chunk):
+    return chunk.decode().split('event: ')[1].split('\n')[0]
+
+def in_background(*steps):
+    """Run (delay, fn, *args) steps on a thread while the stream waits"""
+    def run():
+        for delay, fn, *args in steps:
+            time.sleep(delay)
+            fn(*args)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_write_announced_after_its_bump_is_not_a_refresh(events):
+    # The poll in between sees the bump before its event exists
+    writes = in_background((0.1, generations.bump, 'invoices'), (0.15, publish, 'invoice', {'id': 1}))
+    assert event_type(next(events)) == 'invoice'
+    writes.join()
+
+def test_unannounced_write_in_this_process_refreshes(events):
+    writes = in_background((0.1, generations.bump, 'products'))
+    assert event_type(next(events)) == 'refresh'
+    writes.join()
+
+def test_write_in_another_process_refreshes(events):
+    # A second mapping of the same file bumps as another worker would
+    writes = in_background((0.1, TableGenerations().bump, 'customers'))
+    assert event_type(next(events)) == 'refresh'
+    writes.join()